@@ -0,0 +1,110 @@
+import re
+import sys
+import threading
+import time
+from regression_backend import LocalBackend
+
+
+class CountingBackend(LocalBackend):
+    """
+    LocalBackend that counts round trips and the bytes they fetch, and waits latency seconds per query
+    like a warehouse across the network does
+    """
+
+    def __init__(self, root:str, latency:float = 0.0, threads:int = None):
+        super().__init__(root, threads)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.bytes_fetched = 0
+
+    def count(self, bytes_fetched:int):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.queries += 1
+            self.bytes_fetched += bytes_fetched
+
+    def query(self, sql_cmd:str) -> list:
+        rows = super().query(sql_cmd)
+        self.count(sum(sys.getsizeof(value) for row in rows for value in row.values()))
+        return rows
+
+    def query_pandas(self, sql_cmd:str):
+        df = super().query_pandas(sql_cmd)
+        self.count(int(df.memory_usage(deep=True).sum()))
+        return df
+
+    def reset(self) -> dict:
+        """
+        Round trips and bytes fetched since the last reset
+        """
+        with self.lock:
+            counters = {'queries': self.queries, 'bytes_fetched': self.bytes_fetched}
+            self.queries, self.bytes_fetched = 0, 0
+        return counters
+
+
+
+class BenchFrame:
+    """
+    Result of BenchSession.sql(), executed when it is collected like a Snowpark DataFrame
+    """
+
+    def __init__(self, backend:CountingBackend, sql_cmd:str):
+        self.backend = backend
+        self.sql_cmd = sql_cmd
+
+    def collect(self) -> list:
+        return self.backend.query(self.sql_cmd)
+
+    def to_pandas(self):
+        return self.backend.query_pandas(self.sql_cmd)
+
+
+
+class BenchSession:
+    """
+    Stand-in for a Snowpark session on the DuckDB database of a CountingBackend, for code that takes a session.
+    Every executed statement counts as a round trip
+    """
+
+    def __init__(self, backend:CountingBackend):
+        self.backend = backend
+        self.backend.connection.execute("""create schema if not exists validation_regression""")
+        # Snowflake functions the shared SQL builders use that DuckDB names differently
+        self.backend.connection.execute("""create macro if not exists iff(condition, then_value, else_value) as if(condition, then_value, else_value)""")
+        self.backend.connection.execute("""create macro if not exists parse_json(value) as value::json""")
+
+    def sql(self, sql_cmd:str) -> BenchFrame:
+        # Snowflake DDL of the validation_regression tables: DuckDB has no clustering keys and names the types differently
+        sql_cmd = re.sub(r'\s+cluster by \([^)]*\)', '', sql_cmd)
+        for snowflake_type, duckdb_type in ((r'\bvariant\b', 'json'), (r'\btimestamp_ntz\b', 'timestamp'), (r'\bnumber\(', 'decimal('), (r'\bnumber\b', 'bigint')):
+            sql_cmd = re.sub(snowflake_type, duckdb_type, sql_cmd)
+        return BenchFrame(self.backend, sql_cmd)
+
+    def write_pandas(self, df, table_name:str, schema:str = None, overwrite:bool = False, **kwargs):
+        """
+        Append a dataframe to a table, created from the dataframe when missing, or replace the table when overwrite is set
+        """
+        table = (schema + '.' + table_name if schema else table_name).lower()
+        cursor = self.backend.connection.cursor()
+        try:
+            cursor.register('written', df)
+            if overwrite:
+                cursor.execute(f"""drop table if exists {table}""")
+            cursor.execute(f"""create table if not exists {table} as select * from written limit 0""")
+            cursor.execute(f"""insert into {table} select * from written""")
+        finally:
+            cursor.close()
+        self.backend.count(0)
+
+
+
+class BenchDbt:
+    """
+    Stand-in for the dbt object handed to a Python model: the config of the model is ignored
+    """
+
+    def config(self, **kwargs):
+        pass
@@ -0,0 +1,163 @@
+"""
+Benchmarks of the regression tool on synthetic models, without a warehouse.
+
+Generates a reference / regression pair of Parquet exports, compares them with the local DuckDB backend
+behind a stand-in session that counts round trips and can simulate per query latency, and writes the wall time,
+peak Python memory, query count and bytes fetched of every stage to a JSON file.
+With --compare the run is checked against an earlier result file and exits with 1 on a regression.
+
+    python benchmarks/run_benchmarks.py --rows 100000 --columns 20 --diff-rate 0.01 --latency 0.05
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'validation_lib'), os.path.join(ROOT, 'models', 'validation')]
+
+import duckdb
+import pandas
+import regression_engine
+import regression_outcome
+from regression_log import LogSink
+from regression_pipeline import RunContext
+from regression_validation import data_type_validation_process
+from regression_results import ResultCollector, results_table_ddl
+from synthetic import DTYPES, generate_pair
+from bench_session import CountingBackend, BenchSession, BenchDbt
+
+
+def measure(backend:CountingBackend, name:str, stage, repeat:int, prepare = None) -> dict:
+    """
+    Run a stage repeat times. Wall time is the median of the runs, memory the peak of the Python heap,
+    queries and bytes those of one run. prepare runs untimed before every run
+    """
+    wall_list, peak, counters, outcome = [], 0, {}, None
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        backend.reset()
+        tracemalloc.start()
+        started = time.perf_counter()
+        outcome = stage()
+        wall_list.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        counters = backend.reset()
+    result = {'stage': name, 'wall_seconds': statistics.median(wall_list), 'wall_seconds_min': min(wall_list),
+              'peak_memory_bytes': peak, 'queries': counters['queries'], 'bytes_fetched': counters['bytes_fetched'],
+              'outcome': str(outcome).split('\n')[0][:200]}
+    print(f"""{name:<40} {result['wall_seconds']:>9.3f}s {peak / 2 ** 20:>9.1f} MiB {result['queries']:>6} queries {result['bytes_fetched'] / 2 ** 20:>9.1f} MiB fetched""")
+    return result
+
+
+def run(args) -> dict:
+    root = args.data or tempfile.mkdtemp(prefix='regression_bench_')
+    dtypes = args.dtypes.split(',')
+    config = generate_pair(root, 'BENCH', 'SALES', 'ORDERS', args.rows, args.columns, dtypes, args.key_skew, args.diff_rate, args.seed)
+    config_equal = generate_pair(root, 'BENCH', 'SALES', 'ORDERS_EQUAL', args.rows, args.columns, dtypes, args.key_skew, 0.0, args.seed)
+    backend = CountingBackend(root, args.latency, args.threads)
+    session = BenchSession(backend)
+    regression_engine.use_backend(backend, LogSink(None, 'benchmark_log'))
+    ctx = RunContext(None, LogSink(None, 'benchmark_log'), {}, backend)
+    session.sql(results_table_ddl('validation_regression.regression_results')).collect()
+    collector = ResultCollector(session, 'regression_results', 'validation_regression')
+    database, model, schema = config['database'], config['name'], config['schema']
+    unkeyed = dict(config, primary_key = None)
+
+    def clear_catalog():
+        backend.catalog.tables.clear()
+
+    def compare(config_block:dict, fingerprint:bool = True):
+        def stage():
+            model_result = {}
+            cmd = regression_engine.create_pandas_cmd(None, config_block, [])[3]
+            fingerprint_cmd = regression_engine.create_fingerprint_cmd(None, config_block, []) if fingerprint else None
+            key_diff_cmd = regression_engine.create_key_diff_cmd(None, config_block, [])
+            resultset = regression_engine.regression_process(None, config_block['database'], config_block['name'], config_block['schema'],
+                                                             cmd, fingerprint_cmd, key_diff_cmd, None, False, model_result)
+            collector.add('benchmark', config_block['database'], config_block['schema'], config_block['name'], resultset, model_result)
+            return resultset
+        return stage
+
+    def outcome():
+        collector.write()
+        return regression_outcome.model(BenchDbt(), session).to_pandas().to_dict('records')
+
+    stages = [measure(backend, 'get_model_columns (catalog cold)', lambda: regression_engine.get_model_columns(None, database, model, schema, []), args.repeat, clear_catalog),
+              measure(backend, 'get_model_columns (catalog warm)', lambda: regression_engine.get_model_columns(None, database, model, schema, []), args.repeat)]
+    # Like setup(), resolve every table once, so the counts of the later stages do not depend on the run order
+    backend.catalog.load_models([config, config_equal])
+    stages += [measure(backend, 'data_type_validation_process', lambda: data_type_validation_process(ctx, config)[0], args.repeat),
+               measure(backend, 'regression_process fingerprint match', compare(config_equal), args.repeat),
+               measure(backend, 'regression_process key diff', compare(config), args.repeat),
+               measure(backend, 'regression_process sorted compare', compare(unkeyed, False), args.repeat),
+               measure(backend, 'regression_outcome.model', outcome, 1)]
+    return {'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                            'duckdb': duckdb.__version__, 'pandas': pandas.__version__},
+            'parameters': {'rows': args.rows, 'columns': args.columns, 'dtypes': dtypes, 'key_skew': args.key_skew,
+                           'diff_rate': args.diff_rate, 'rows_changed': config['rows_changed'], 'latency': args.latency,
+                           'threads': args.threads, 'repeat': args.repeat, 'seed': args.seed},
+            'stages': stages}
+
+
+def compare_results(baseline:dict, current:dict, threshold:float) -> list:
+    """
+    Stages that got slower than threshold times the baseline or need more queries
+    """
+    baseline_stages = {stage['stage']: stage for stage in baseline['stages']}
+    regressions = []
+    for stage in current['stages']:
+        before = baseline_stages.get(stage['stage'])
+        if before is None:
+            continue
+        if before['wall_seconds'] and stage['wall_seconds'] > threshold * before['wall_seconds']:
+            regressions.append(f"""{stage['stage']} : {before['wall_seconds']:.3f}s -> {stage['wall_seconds']:.3f}s""")
+        if stage['queries'] > before['queries']:
+            regressions.append(f"""{stage['stage']} : {before['queries']} -> {stage['queries']} queries""")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the regression tool on synthetic models without a warehouse')
+    parser.add_argument('--rows', type=int, default=100000, help='rows per side')
+    parser.add_argument('--columns', type=int, default=20, help='value columns besides the two key columns')
+    parser.add_argument('--dtypes', default=','.join(DTYPES), help=f"""data types the value columns cycle through, of {','.join(DTYPES)}""")
+    parser.add_argument('--key-skew', type=float, default=0.0, help='0 for uniform keys, the Zipf exponent minus 1 otherwise')
+    parser.add_argument('--diff-rate', type=float, default=0.01, help='fraction of rows with a changed value on the regression side')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per round trip')
+    parser.add_argument('--threads', type=int, default=None, help='DuckDB threads, all cores by default')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the median is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=None, help='directory of the generated Parquet exports, a temporary directory by default')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file the results are written to')
+    parser.add_argument('--compare', default=None, help='earlier result file to check this run against')
+    parser.add_argument('--threshold', type=float, default=1.5, help='slowdown factor reported as a regression')
+    args = parser.parse_args()
+    # Deprecation notices of pandas would drown the report
+    warnings.simplefilter('ignore', FutureWarning)
+
+    results = run(args)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, default=str)
+    print(f"""Results written to {args.output}""")
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare_results(json.load(baseline), results, args.threshold)
+        for regression in regressions:
+            print(f"""Regression : {regression}""")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import os
+import duckdb
+import numpy
+import pandas
+
+
+# Data types of the generated value columns and the DuckDB type they are written with
+DTYPES = {'int': 'bigint', 'float': 'double', 'decimal': 'decimal(12,2)', 'string': 'varchar',
+          'date': 'date', 'timestamp': 'timestamp', 'boolean': 'boolean'}
+# Composite primary key of every generated model
+KEY_COLUMNS = ['CUSTOMER_ID', 'LINE_NO']
+
+
+def value_column(rng, dtype:str, rows:int):
+    """
+    Random values of one column of a data type
+    """
+    if dtype == 'int':
+        return rng.integers(0, 1000000, rows)
+    if dtype in ('float', 'decimal'):
+        return numpy.round(rng.uniform(0, 10000, rows), 2)
+    if dtype == 'string':
+        return pandas.Series(rng.integers(0, 1000000, rows)).astype(str).radd('S').to_numpy()
+    if dtype == 'date':
+        return pandas.Timestamp('2020-01-01').normalize() + pandas.to_timedelta(rng.integers(0, 2000, rows), unit='D')
+    if dtype == 'timestamp':
+        return pandas.Timestamp('2020-01-01') + pandas.to_timedelta(rng.integers(0, 10 ** 8, rows), unit='s')
+    if dtype == 'boolean':
+        return rng.integers(0, 2, rows).astype(bool)
+    raise ValueError(f"""Unsupported dtype {dtype}. Supported dtypes : {list(DTYPES)}""")
+
+
+def changed_values(values, dtype:str):
+    """
+    Values that differ from the given ones
+    """
+    if dtype == 'string':
+        return pandas.Series(values).astype(str).add('X').to_numpy()
+    if dtype in ('date', 'timestamp'):
+        return pandas.Series(values) + pandas.Timedelta(days=1)
+    if dtype == 'boolean':
+        return ~values
+    return values + 1
+
+
+def key_columns(rng, rows:int, key_skew:float) -> pandas.DataFrame:
+    """
+    Unique composite key. CUSTOMER_ID is uniform for key_skew 0 and follows a Zipf law of exponent 1 + key_skew otherwise,
+    so a few customers hold most rows. LINE_NO numbers the rows of a customer
+    """
+    customers = max(rows // 10, 1)
+    if key_skew > 0:
+        customer_id = (rng.zipf(1 + key_skew, rows) - 1) % customers
+    else:
+        customer_id = rng.integers(0, customers, rows)
+    df = pandas.DataFrame({'CUSTOMER_ID': customer_id})
+    df['LINE_NO'] = df.groupby('CUSTOMER_ID').cumcount()
+    return df
+
+
+def write_parquet(df:pandas.DataFrame, column_types:dict, path:str):
+    """
+    Write a dataframe to a Parquet file with the DuckDB type of every column
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = duckdb.connect()
+    connection.register('generated', df)
+    projection = ', '.join(f'"{col}"::{column_types[col]} "{col}"' for col in df.columns)
+    connection.execute(f"""copy (select {projection} from generated) to '{path}' (format parquet)""")
+    connection.close()
+
+
+def generate_pair(root:str, database:str, schema:str, model:str, rows:int, columns:int, dtypes:list = None,
+                  key_skew:float = 0.0, diff_rate:float = 0.0, seed:int = 0) -> dict:
+    """
+    Write the reference and the regression Parquet export of a synthetic model under root, laid out for LocalBackend.
+    The model has the two key columns and columns value columns whose data types cycle through dtypes.
+    diff_rate of the rows get one value changed on the regression side.
+    Returns the config block of the model with the number of changed rows
+    """
+    dtypes = dtypes or list(DTYPES)
+    rng = numpy.random.default_rng(seed)
+    df_ref = key_columns(rng, rows, key_skew)
+    column_types = {col: 'bigint' for col in KEY_COLUMNS}
+    for position in range(columns):
+        dtype = dtypes[position % len(dtypes)]
+        col = f"""VAL_{position + 1:03d}_{dtype.upper()}"""
+        df_ref[col] = value_column(rng, dtype, rows)
+        column_types[col] = DTYPES[dtype]
+
+    df_regression = df_ref.copy()
+    changed = rng.choice(rows, int(rows * diff_rate), replace=False) if diff_rate > 0 else numpy.array([], dtype=int)
+    changed_column = rng.integers(0, columns, len(changed)) if columns else numpy.array([], dtype=int)
+    for position in range(columns):
+        row_list = changed[changed_column == position]
+        if len(row_list):
+            col = df_regression.columns[len(KEY_COLUMNS) + position]
+            df_regression.loc[row_list, col] = numpy.asarray(changed_values(df_regression.loc[row_list, col].to_numpy(), dtypes[position % len(dtypes)]))
+
+    write_parquet(df_ref, column_types, os.path.join(root, database.upper(), schema.upper(), model.upper() + '.parquet'))
+    write_parquet(df_regression, column_types, os.path.join(root, database.upper(), schema.upper() + '_REGRESSION', model.upper() + '.parquet'))
+    return {'name': model.upper(), 'database': database.upper(), 'schema': schema.upper(),
+            'primary_key': ','.join(KEY_COLUMNS), 'rows_changed': len(changed)}
@@ -1,19 +1,45 @@
--- Create schema,stage and push config file
+-- Create schema,stage when missing and push config file and the shared python modules imported by the validation models
+-- The schema keeps the results, run state, baselines and config cache of earlier releases, so it is never replaced
 
-{% macro push_configs(release_notes_file,regression_config_file) %}
+{% macro push_configs(release_notes_file,regression_config_file,validation_lib_path=none) %}
 
   {% set process_schema = "VALIDATION_REGRESSION" %}
-  {% set stage_name = "CONFIGS" %}  
+  {% set stage_name = "CONFIGS" %}
 
   {% set put_command %}
-    
-    CREATE OR REPLACE SCHEMA {{ process_schema }};
-    CREATE OR REPLACE STAGE {{ process_schema }}.{{ stage_name }} FILE_FORMAT = (TYPE = 'JSON'); 
+
+    CREATE SCHEMA IF NOT EXISTS {{ process_schema }};
+    CREATE STAGE IF NOT EXISTS {{ process_schema }}.{{ stage_name }} FILE_FORMAT = (TYPE = 'JSON');
     PUT 'file://{{ regression_config_file }}' @{{ process_schema }}.{{ stage_name }} AUTO_COMPRESS=FALSE OVERWRITE = TRUE;
     PUT 'file://{{ release_notes_file }}' @{{ process_schema }}.{{ stage_name }} AUTO_COMPRESS=FALSE OVERWRITE = TRUE;
-    
+
+  {% endset %}
+
+  {% do run_query(put_command) %}
+  {% do push_validation_lib(validation_lib_path) %}
+
+{% endmacro %}
+
+
+-- Push the shared python modules imported by the validation models, without touching the config files.
+-- The default path is the validation_lib folder of this project, run as the root project or installed as a package
+
+{% macro push_validation_lib(validation_lib_path=none) %}
+
+  {% set process_schema = "VALIDATION_REGRESSION" %}
+  {% set stage_name = "CONFIGS" %}
+  {% if validation_lib_path is none %}
+    {% set validation_lib_path = "validation_lib" if project_name == "dbt_snf_regression_test" else "dbt_packages/dbt_snf_regression_test/validation_lib" %}
+  {% endif %}
+
+  {% set put_command %}
+
+    CREATE SCHEMA IF NOT EXISTS {{ process_schema }};
+    CREATE STAGE IF NOT EXISTS {{ process_schema }}.{{ stage_name }} FILE_FORMAT = (TYPE = 'JSON');
+    PUT 'file://{{ validation_lib_path }}/*.py' @{{ process_schema }}.{{ stage_name }}/validation_lib AUTO_COMPRESS=FALSE OVERWRITE = TRUE;
+
   {% endset %}
 
   {% do run_query(put_command) %}
 
-{% endmacro %}
\ No newline at end of file
+{% endmacro %}
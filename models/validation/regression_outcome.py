@@ -1,50 +1,20 @@
-
-import snowflake.snowpark.functions as F
-from snowflake.snowpark import Session
-import modin.pandas as pd
-import snowflake.snowpark.modin.plugin
-from snowflake.connector.pandas_tools import write_pandas
-import logging
+from regression_results import model_verdict_sql, outcome_sql
 
 def model(dbt, session):
     
     dbt.config(
-        packages = ["snowflake-snowpark-python","yaml","pandas","modin"],
+        packages = ["snowflake-snowpark-python","pandas"],
         python_version="3.12",
-        materialized = "table"
+        materialized = "table",
+        imports = ["@validation_regression.configs/validation_lib/regression_sql.py",
+                   "@validation_regression.configs/validation_lib/regression_sample.py",
+                   "@validation_regression.configs/validation_lib/regression_results.py"]
     )
 
-    df_table_list = session.sql(f"""select table_schema||'.'||table_name table_name from information_schema.tables 
-                                where table_schema = 'VALIDATION_REGRESSION' and 
-                                table_type = 'BASE TABLE' and 
-                                table_name not like ('REGRESSION%') and 
-                                table_name not like ('DATA_TYPE%') """).to_pandas()
-    
-    session.sql(""" create or replace  table validation_regression.regression_temptable(len_records int) """).collect()
-
-    if not df_table_list.empty:
-        for index, row in df_table_list.iterrows():
-            sql_stmt =  'select results from ' + row['TABLE_NAME']
-            session.sql(sql_stmt).collect()
-            session.sql(f"""Insert into validation_regression.regression_temptable 
-                        select len($1) from table(result_scan(last_query_id())) """).collect()
-
-    df_num_of_records = session.sql(f"""select count(distinct len_records) count 
-                                    from validation_regression.regression_temptable""").to_pandas()
-
-    num_of_records = df_num_of_records['COUNT'].iloc[0]
-    
-    if num_of_records == 1:
-        df_value = session.sql(f"""select distinct len_records value 
-                               from validation_regression.regression_temptable""").to_pandas()
-        value = df_value['VALUE'].iloc[0]
+    results_table = 'validation_regression.regression_results'
 
-        if value == 25:
-            result = 'TRUE'
-        else:
-            result = 'FALSE'
-    else:
-        result = 'FALSE'
-    return_result = session.create_dataframe([(result)], schema = ["result"])
+    # Verdict of every model of the latest run
+    session.sql(f"""create or replace table validation_regression.regression_model_verdict as {model_verdict_sql(results_table)}""").collect()
 
-    return return_result
\ No newline at end of file
+    # Overall verdict with the number of passed, failed and errored models, computed by the warehouse when dbt materialises the model
+    return session.sql(outcome_sql(results_table))
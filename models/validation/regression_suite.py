@@ -0,0 +1,63 @@
+from regression_pipeline import setup, run_stages
+from regression_validation import TYPE_VALIDATION_STAGE, type_validation_stage
+from regression_engine import REGRESSION_STAGE, regression_stage
+
+
+def model(dbt, session):
+    dbt.config(
+        packages = ["snowflake-snowpark-python","yaml","pandas","modin"],
+        python_version="3.12",
+        materialized = "table",
+        imports = ["@validation_regression.configs/validation_lib/regression_log.py",
+                   "@validation_regression.configs/validation_lib/regression_catalog.py",
+                   "@validation_regression.configs/validation_lib/regression_config.py",
+                   "@validation_regression.configs/validation_lib/regression_sql.py",
+                   "@validation_regression.configs/validation_lib/regression_predicate.py",
+                   "@validation_regression.configs/validation_lib/regression_diff.py",
+                   "@validation_regression.configs/validation_lib/regression_drilldown.py",
+                   "@validation_regression.configs/validation_lib/regression_executor.py",
+                   "@validation_regression.configs/validation_lib/regression_async.py",
+                   "@validation_regression.configs/validation_lib/regression_profile.py",
+                   "@validation_regression.configs/validation_lib/regression_state.py",
+                   "@validation_regression.configs/validation_lib/regression_baseline.py",
+                   "@validation_regression.configs/validation_lib/regression_sample.py",
+                   "@validation_regression.configs/validation_lib/regression_planner.py",
+                   "@validation_regression.configs/validation_lib/regression_results.py",
+                   "@validation_regression.configs/validation_lib/regression_types.py",
+                   "@validation_regression.configs/validation_lib/regression_perf.py",
+                   "@validation_regression.configs/validation_lib/regression_backend.py",
+                   "@validation_regression.configs/validation_lib/regression_pipeline.py",
+                   "@validation_regression.configs/validation_lib/regression_validation.py",
+                   "@validation_regression.configs/validation_lib/regression_engine.py"]
+    )
+
+    # dbt only hands over the configs a model reads with a literal dbt.config.get
+    options = {'log_batch_size': dbt.config.get('log_batch_size'),
+               'log_synchronous': dbt.config.get('log_synchronous'),
+               'perf_summary': dbt.config.get('perf_summary'),
+               'type_validation_batch': dbt.config.get('type_validation_batch'),
+               'regression_parallelism': dbt.config.get('regression_parallelism'),
+               'regression_async': dbt.config.get('regression_async'),
+               'regression_force_rerun': dbt.config.get('regression_force_rerun'),
+               'regression_planner': dbt.config.get('regression_planner'),
+               'planner_memory_rows': dbt.config.get('planner_memory_rows'),
+               'planner_memory_cells': dbt.config.get('planner_memory_cells'),
+               'planner_memory_bytes': dbt.config.get('planner_memory_bytes'),
+               'planner_huge_rows': dbt.config.get('planner_huge_rows'),
+               'planner_sample_fraction': dbt.config.get('planner_sample_fraction'),
+               'regression_diff_limit': dbt.config.get('regression_diff_limit'),
+               'regression_spill_stage': dbt.config.get('regression_spill_stage'),
+               'regression_spill_chunk_bytes': dbt.config.get('regression_spill_chunk_bytes'),
+               'baseline_keep': dbt.config.get('baseline_keep'),
+               'baseline_ttl_days': dbt.config.get('baseline_ttl_days')}
+
+    ctx = setup(session, 'validation_regression.regression_suite_log', options)
+    try:
+        # A model failing the data type validation is not compared
+        run_stages(ctx, [(TYPE_VALIDATION_STAGE, lambda ctx: type_validation_stage(ctx, skip_failed = True)),
+                         (REGRESSION_STAGE, regression_stage)])
+    finally:
+        ctx.close()
+
+    # Outcome of every stage per model
+    return ctx.stage_results()
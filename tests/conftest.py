@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'validation_lib'))
+
+
+@pytest.fixture
+def export(tmp_path):
+    """
+    Write a table of the local backend from a DuckDB select, e.g. export('SALES', 'ORDERS', "select 1 \"ID\"")
+    """
+    duckdb = pytest.importorskip('duckdb')
+
+    def write(schema:str, model:str, select:str, database:str = 'DB'):
+        path = tmp_path / database / schema.upper() / (model.upper() + '.parquet')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = duckdb.connect()
+        connection.execute(f"""copy ({select}) to '{path}' (format parquet)""")
+        connection.close()
+    return write
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    The regression engine pointed at a LocalBackend over the exports of the test
+    """
+    pytest.importorskip('duckdb')
+    import regression_engine
+    from regression_backend import LocalBackend
+    from regression_log import LogSink
+    regression_engine.use_backend(LocalBackend(str(tmp_path)), LogSink(None, 'test_log'))
+    return regression_engine
@@ -0,0 +1,43 @@
+from regression_baseline import row_hash_expr, baseline_ctas_sql, side_fingerprint_sql, baseline_diff_sql, baseline_counts_sql
+
+
+REF = """select * from (values (1, 'a', 10), (2, 'b', 20), (3, 'c', 30), (null, 'n', 0)) t("ID", "NAME", "AMOUNT")"""
+# ID 2 removed, ID 3 changed, ID 5 added, the NULL key unchanged
+REGRESSION = """select * from (values (1, 'a', 10), (3, 'c', 31), (5, 'e', 50), (null, 'n', 0)) t("ID", "NAME", "AMOUNT")"""
+
+
+def test_row_hash_expr():
+    assert row_hash_expr(['ID', 'NAME'], 'ref') == 'hash(ref."ID",ref."NAME")'
+
+
+def test_side_fingerprint_sql():
+    assert side_fingerprint_sql('db.sales.orders', ['ID'], '"ID" > 1') == 'select count(*) num_rows, hash_agg("ID") fingerprint from db.sales.orders where "ID" > 1'
+
+
+def test_key_only_models_hash_the_key():
+    ctas = baseline_ctas_sql('baseline', 'db.sales.orders', ['ID'], ['ID'])
+    assert 'hash()' not in ctas and 'hash("ID") row_hash' in ctas
+    assert 'hash()' not in baseline_diff_sql('baseline', 'db.sales_regression.orders', ['ID'], ['ID'])
+
+
+def counts(engine, export, key_column_list:list, column_list:list, ref:str = REF, regression:str = REGRESSION) -> dict:
+    export('SALES', 'ORDERS', ref)
+    export('SALES_REGRESSION', 'ORDERS', regression)
+    model_name_ref, model_name_regression = engine.backend.model_tables('DB', 'ORDERS', 'SALES')
+    engine.backend.query(baseline_ctas_sql('baseline', model_name_ref, key_column_list, column_list))
+    row = engine.backend.query(baseline_counts_sql(baseline_diff_sql('baseline', model_name_regression, key_column_list, column_list)))[0]
+    return (row['ROWS_ADDED'], row['ROWS_REMOVED'], row['ROWS_CHANGED'])
+
+
+def test_keyed_baseline_diff(engine, export):
+    assert counts(engine, export, ['ID'], ['ID', 'NAME', 'AMOUNT']) == (1, 1, 1)
+
+
+def test_baseline_diff_without_a_key_counts_duplicate_rows(engine, export):
+    ref = """select * from (values (1, 'a'), (1, 'a'), (2, 'b')) t("ID", "NAME")"""
+    regression = """select * from (values (1, 'a'), (2, 'b'), (3, 'c')) t("ID", "NAME")"""
+    assert counts(engine, export, [], ['ID', 'NAME'], ref, regression) == (1, 1, 0)
+
+
+def test_key_only_baseline_diff(engine, export):
+    assert counts(engine, export, ['ID'], ['ID']) == (1, 1, 0)
@@ -0,0 +1,37 @@
+import json
+import pytest
+from regression_config import parse_release, parse_config, ConfigLoader
+
+
+RELEASE = {'releases': [{'release': 'v1.1', 'models_impacted': {'orders': ['amount'], 'customers': []}},
+                        {'release': 'v1.0', 'models_impacted': {'old_model': []}}]}
+CONFIG = [{'name': 'orders', 'database': 'db', 'schema': 'sales', 'primary_key': 'id'}]
+
+
+def test_parse_release_reads_the_current_release():
+    assert parse_release(json.dumps(RELEASE)) == {'ORDERS': ['AMOUNT'], 'CUSTOMERS': []}
+
+
+@pytest.mark.parametrize('document', [{}, {'releases': []}, {'releases': [{'models_impacted': ['orders']}]},
+                                      {'releases': [{'models_impacted': {'orders': 'amount'}}]}])
+def test_parse_release_rejects_malformed_files(document):
+    with pytest.raises(ValueError):
+        parse_release(document)
+
+
+@pytest.mark.parametrize('document', [{'name': 'orders'}, ['orders'], [{'name': 'orders', 'database': 'db'}]])
+def test_parse_config_rejects_malformed_files(document):
+    with pytest.raises(ValueError):
+        parse_config(document)
+
+
+def test_load_local_parses_and_caches_by_content(tmp_path):
+    release_path, config_path = tmp_path / 'release_v1.1.json', tmp_path / 'regression_config.json'
+    release_path.write_text(json.dumps(RELEASE))
+    config_path.write_text(json.dumps(CONFIG))
+    loader = ConfigLoader()
+    loaded = loader.load_local(str(release_path), str(config_path))
+    assert loaded['release_items'] == {'ORDERS': ['AMOUNT'], 'CUSTOMERS': []}
+    assert loaded['config_list'] == CONFIG
+    assert loader.load_local(str(release_path), str(config_path))['cached'] == 'memory'
+    assert loader.queries == 0
@@ -0,0 +1,43 @@
+from regression_sql import EQUAL_RESULT
+from regression_drilldown import parse_drilldown, bucket_condition, drilldown
+
+
+def test_parse_drilldown():
+    assert parse_drilldown({}) is None
+    assert parse_drilldown({'drilldown': True}) == {'buckets': 64, 'max_depth': 3, 'leaf_rows': 1000}
+    assert parse_drilldown({'drilldown': {'buckets': 1, 'max_depth': 0}})['buckets'] == 2
+
+
+def test_bucket_condition_keeps_the_filter():
+    assert bucket_condition(['ID'], 8, [1, 5], '"REGION" = \'EU\'') == '("REGION" = \'EU\') and mod(abs(hash("ID")), 8) in (1,5)'
+
+
+def test_drilldown_subdivides_mismatched_buckets_until_they_are_small():
+    answers = [[{'BUCKET': 3, 'REF_ROWS': 5000, 'REGRESSION_ROWS': 5000}],
+               [{'BUCKET': 19, 'REF_ROWS': 80, 'REGRESSION_ROWS': 81}]]
+    queries = []
+
+    def run_query(sql_cmd:str) -> list:
+        queries.append(sql_cmd)
+        return answers[len(queries) - 1]
+    leaf_condition, levels = drilldown(run_query, 'ref', 'regression', ['ID'], ['ID', 'AMOUNT'], buckets = 8, max_depth = 3, leaf_rows = 100)
+    assert len(queries) == 2
+    assert 'mod(abs(hash("ID")), 8) in (3)' in queries[1]
+    assert leaf_condition == 'mod(abs(hash("ID")), 64) in (19)'
+    assert [level['mismatched_buckets'] for level in levels] == [1, 1]
+
+
+def test_drilldown_of_equal_models():
+    assert drilldown(lambda sql_cmd: [], 'ref', 'regression', ['ID'], ['ID'])[0] is None
+
+
+def test_mismatched_buckets_are_never_reported_equal(engine, export, monkeypatch):
+    # Identical rows in both sides: the row level diff finds nothing, yet the bucket hashes differed
+    rows = """select * from (values (1, 'a'), (2, 'b')) t("ID", "NAME")"""
+    export('SALES', 'ORDERS', rows)
+    export('SALES_REGRESSION', 'ORDERS', rows)
+    monkeypatch.setattr(engine, 'drilldown', lambda *args, **kwargs: ('true', [{'depth': 0, 'buckets': 64, 'mismatched_buckets': 1, 'largest_bucket_rows': 2}]))
+    drilldown_cmd = engine.create_drilldown_cmd(None, {'name': 'ORDERS', 'database': 'DB', 'schema': 'SALES', 'drilldown': True}, [])
+    resultset = engine.drilldown_process(None, drilldown_cmd)
+    assert resultset != EQUAL_RESULT
+    assert resultset.startswith('Hash buckets differ')
@@ -0,0 +1,42 @@
+import threading
+import time
+from regression_executor import run_parallel
+
+
+def test_outcomes_keep_the_task_order_whatever_order_the_tasks_finish_in():
+    def worker(task:int) -> int:
+        time.sleep(0.01 * (5 - task))
+        return task * 10
+    outcomes = run_parallel([1, 2, 3, 4], worker, 4)
+    assert outcomes == [(1, 10, None), (2, 20, None), (3, 30, None), (4, 40, None)]
+
+
+def test_a_failing_task_does_not_stop_the_others():
+    def worker(task:str) -> str:
+        if task == 'bad':
+            raise ValueError('bad model')
+        return task.upper()
+    for parallelism in (1, 3):
+        outcomes = run_parallel(['a', 'bad', 'c'], worker, parallelism)
+        assert [(task, result) for task, result, _ in outcomes] == [('a', 'A'), ('bad', None), ('c', 'C')]
+        assert isinstance(outcomes[1][2], ValueError) and outcomes[0][2] is None and outcomes[2][2] is None
+
+
+def test_tasks_start_largest_first():
+    started = []
+    run_parallel(['small', 'large', 'medium'], started.append, 1, weight = {'small': 1, 'large': 100, 'medium': 10}.get)
+    assert started == ['large', 'medium', 'small']
+
+
+def test_parallelism_bounds_the_running_tasks():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def worker(task:int):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+    run_parallel(list(range(12)), worker, 3)
+    assert peak[0] <= 3
@@ -0,0 +1,165 @@
+import pytest
+from regression_sql import EQUAL_RESULT
+from regression_drilldown import set_diff_sql, set_diff_counts_sql
+from regression_diff import diff_rows_sql
+from regression_sample import SAMPLE_LABEL
+
+
+REF = """select * from (values (1, 'a', 10), (2, 'b', 20), (3, 'c', 30), (4, 'd', 40)) t("ID", "NAME", "AMOUNT")"""
+# ID 2 removed, ID 3 changed, ID 5 added
+REGRESSION = """select * from (values (1, 'a', 10), (3, 'c', 31), (4, 'd', 40), (5, 'e', 50)) t("ID", "NAME", "AMOUNT")"""
+
+
+def config(**options) -> dict:
+    return dict({'name': 'ORDERS', 'database': 'DB', 'schema': 'SALES'}, **options)
+
+
+def compare(engine, config_block:dict) -> tuple:
+    model_result = {}
+    fingerprint_cmd = engine.create_fingerprint_cmd(None, config_block, [])
+    return engine.compare_model(None, config_block, [], fingerprint_cmd, False, model_result), model_result
+
+
+def test_key_diff_counts_added_removed_and_changed_rows(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', REGRESSION)
+    resultset, model_result = compare(engine, config(primary_key = 'ID'))
+    assert resultset.startswith('Rows added : 1. Rows removed : 1. Rows changed : 1.')
+    assert (model_result['rows_added'], model_result['rows_removed'], model_result['rows_changed']) == (1, 1, 1)
+
+
+def test_key_diff_does_not_shift_rows_after_a_removed_key(engine, export):
+    export('SALES', 'ORDERS', """select range "ID", range * 2 "AMOUNT" from range(1, 101)""")
+    export('SALES_REGRESSION', 'ORDERS', """select range "ID", range * 2 "AMOUNT" from range(2, 102)""")
+    resultset, model_result = compare(engine, config(primary_key = 'ID'))
+    assert (model_result['rows_added'], model_result['rows_removed'], model_result['rows_changed']) == (1, 1, 0)
+
+
+def test_null_keys_match_each_other(engine, export):
+    rows = """select * from (values (null, 'a', 10), (2, 'b', 20)) t("ID", "NAME", "AMOUNT")"""
+    export('SALES', 'ORDERS', rows)
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (null, 'a', 11), (2, 'b', 20)) t("ID", "NAME", "AMOUNT")""")
+    resultset, model_result = compare(engine, config(primary_key = 'ID'))
+    assert (model_result['rows_added'], model_result['rows_removed'], model_result['rows_changed']) == (0, 0, 1)
+
+
+def test_duplicate_keys_fall_back_to_the_sorted_compare(engine, export):
+    export('SALES', 'ORDERS', """select * from (values (1, 'a', 10), (1, 'b', 20), (2, 'c', 30)) t("ID", "NAME", "AMOUNT")""")
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 'a', 10), (1, 'b', 21), (2, 'c', 30)) t("ID", "NAME", "AMOUNT")""")
+    resultset, model_result = compare(engine, config(primary_key = 'ID'))
+    assert resultset.startswith('Rows changed : 1.')
+    assert 'rows_added' not in model_result and model_result['rows_changed'] == 1
+
+
+def test_equal_models_match_on_the_fingerprint(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', REF)
+    resultset, model_result = compare(engine, config(primary_key = 'ID'))
+    assert resultset == EQUAL_RESULT
+    assert model_result['ref_fingerprint'] == model_result['regression_fingerprint']
+
+
+def test_sorted_compare_without_key(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 'a', 10), (2, 'b', 21), (3, 'c', 30), (4, 'd', 40)) t("ID", "NAME", "AMOUNT")""")
+    resultset, model_result = compare(engine, config(fingerprint = False))
+    assert resultset.startswith('Rows changed : 1.')
+    assert model_result['rows_changed'] == 1
+
+
+def test_async_mode_reads_both_sides_together(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 'a', 10), (2, 'b', 21), (3, 'c', 30), (4, 'd', 40)) t("ID", "NAME", "AMOUNT")""")
+    model_result = {}
+    resultset = engine.compare_model(None, config(fingerprint = False), [], None, True, model_result)
+    assert resultset.startswith('Rows changed : 1.')
+    stages = [(row[1], row[2]) for row in engine.perf.sink.rows]
+    assert ('ORDERS', 'read_ref') in stages and ('ORDERS', 'read_regression') in stages
+
+
+def test_filters_are_pushed_down_to_both_sides(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', REGRESSION)
+    config_block = config(primary_key = 'ID', filters = [{'column': 'ID', 'operator': 'in', 'value': [1, 4]}])
+    pandas_cmd = engine.create_pandas_cmd(None, config_block, [])[3]
+    assert pandas_cmd['ref_sql'].endswith(""" where ("ID" in (1,4))""")
+    resultset, model_result = compare(engine, config_block)
+    assert resultset == EQUAL_RESULT
+
+
+def test_excluded_columns_are_not_compared(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 'a', 11), (2, 'b', 21), (3, 'c', 31), (4, 'd', 41)) t("ID", "NAME", "AMOUNT")""")
+    config_block = config(primary_key = 'ID')
+    assert engine.compare_model(None, config_block, ['AMOUNT'], engine.create_fingerprint_cmd(None, config_block, ['AMOUNT'])) == EQUAL_RESULT
+
+
+def test_column_groups_report_every_differing_group(engine, export):
+    columns = ', '.join(f"""range + {position} "V{position}\"""" for position in range(6))
+    # Row 7 changes in V1 (group 1) and V4 (group 3)
+    changed = ', '.join(f"""range + {position}{' + (range = 7)::int' if position in (1, 4) else ''} "V{position}\"""" for position in range(6))
+    export('SALES', 'ORDERS', f"""select {columns} from range(20)""")
+    export('SALES_REGRESSION', 'ORDERS', f"""select {changed} from range(20)""")
+    resultset, model_result = compare(engine, config(column_groups = 2))
+    assert resultset.count('Column group') == 2
+    assert 'Column group 1 of 3' in resultset and 'Column group 3 of 3' in resultset
+    assert model_result['rows_changed'] == 1
+
+
+def test_column_groups_stop_on_a_row_count_mismatch(engine, export):
+    columns = ', '.join(f"""range + {position} "V{position}\"""" for position in range(6))
+    export('SALES', 'ORDERS', f"""select {columns} from range(20)""")
+    export('SALES_REGRESSION', 'ORDERS', f"""select {columns} from range(19)""")
+    for fingerprint in (True, False):
+        resultset, model_result = compare(engine, config(column_groups = 2, fingerprint = fingerprint))
+        assert resultset.startswith('The data frames are not equal in size.')
+        assert 'Column group' not in resultset
+        assert (model_result['ref_rows'], model_result['regression_rows']) == (20, 19)
+        assert model_result.get('rows_changed') is None
+
+
+def test_set_diff_counts_duplicate_rows(engine, export):
+    export('SALES', 'ORDERS', """select * from (values (1, 'a'), (1, 'a'), (2, 'b')) t("ID", "NAME")""")
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 'a'), (2, 'b')) t("ID", "NAME")""")
+    model_name_ref, model_name_regression = engine.backend.model_tables('DB', 'ORDERS', 'SALES')
+    diff_cmd = set_diff_sql(model_name_ref, model_name_regression, ['ID', 'NAME'])
+    counts = engine.backend.query(set_diff_counts_sql(diff_cmd))[0]
+    assert (counts['ROWS_ADDED'], counts['ROWS_REMOVED'], counts['ROWS_CHANGED']) == (0, 1, 0)
+    rows = engine.backend.query(diff_rows_sql(diff_cmd, ['ID', 'NAME'], 10))
+    assert [(row['ID'], row['NAME'], row['DIFF_TYPE'], row['NUM_ROWS']) for row in rows] == [(1, 'a', 'REMOVED', 1)]
+
+
+def test_drilldown_isolates_the_differing_rows(engine, export):
+    export('SALES', 'ORDERS', """select range "ID", range * 2 "AMOUNT" from range(1000)""")
+    export('SALES_REGRESSION', 'ORDERS', """select range "ID", range * 2 + (range = 500)::int "AMOUNT" from range(1000)""")
+    for key in ('ID', None):
+        drilldown = {'buckets': 8, 'max_depth': 2, 'leaf_rows': 50}
+        resultset, model_result = compare(engine, config(primary_key = key, drilldown = drilldown, fingerprint = False))
+        if key:
+            assert resultset.startswith('Rows added : 0. Rows removed : 0. Rows changed : 1.')
+        else:
+            assert resultset.startswith('Rows added : 1. Rows removed : 1. Rows changed : 0.')
+        assert '500' in resultset
+
+
+def test_sample_process_estimates_the_mismatch_rate(engine, export):
+    export('SALES', 'ORDERS', """select range "ID", range * 2 "AMOUNT" from range(1000)""")
+    export('SALES_REGRESSION', 'ORDERS', """select range "ID", range * 2 "AMOUNT" from range(1000)""")
+    report = engine.sample_process(None, config(primary_key = 'ID', sample = 0.5), [])
+    assert report.startswith(SAMPLE_LABEL + '50.0000% of rows.')
+    assert 'Mismatched rows : 0.' in report
+
+
+def test_warehouse_only_stages_fail_explicitly(engine, export):
+    export('SALES', 'ORDERS', REF)
+    export('SALES_REGRESSION', 'ORDERS', REF)
+    with pytest.raises(NotImplementedError, match = 'not supported on the local backend'):
+        engine.spill_process(None, config(), [])
+    with pytest.raises(NotImplementedError, match = 'not supported on the local backend'):
+        engine.profile_process(None, 'ORDERS', {'sql': 'select 1', 'column_list': []})
+
+
+def test_catalog_reads_columns_and_row_counts_from_the_exports(engine, export):
+    export('SALES', 'ORDERS', REF)
+    assert engine.catalog.columns('DB', 'SALES', 'ORDERS') == ['ID', 'NAME', 'AMOUNT']
+    assert engine.catalog.stats('DB', 'SALES', 'ORDERS')['row_count'] == 4
@@ -0,0 +1,67 @@
+from regression_log import sql_literal, BufferedSink, LogSink
+
+
+class RecordingSession:
+    """
+    Records the statements it is given and fails the ones whose position is in fail_at
+    """
+
+    def __init__(self, fail_at = ()):
+        self.fail_at = set(fail_at)
+        self.statements = []
+        self.executed = []
+
+    def sql(self, sql_cmd:str):
+        self.statements.append(sql_cmd)
+        return self
+
+    def collect(self):
+        if len(self.statements) in self.fail_at:
+            raise RuntimeError('insert failed')
+        self.executed.append(self.statements[-1])
+        return []
+
+
+def test_sql_literal():
+    assert sql_literal(None) == 'NULL'
+    assert sql_literal(True) == 'TRUE'
+    assert sql_literal("it's") == "'it''s'"
+    assert sql_literal('a\\b') == "'a\\\\b'"
+
+
+def test_failed_chunk_does_not_write_earlier_chunks_again():
+    session = RecordingSession(fail_at = [2])
+    sink = BufferedSink(session, 'log', ['value'], batch_size = 1000)
+    sink.max_statement_bytes = 40
+    for value in range(6):
+        sink.append((value,))
+    try:
+        sink.flush()
+    except RuntimeError:
+        pass
+    written = sink.flushed_upto
+    assert 0 < written < 6
+    sink.flush()
+    assert sink.flushed_upto == 6
+    assert sum(statement.count('(') - 1 for statement in session.executed) == 6
+    sink.close()
+
+
+def test_log_write_errors_do_not_fail_the_caller():
+    session = RecordingSession(fail_at = [1])
+    sink = LogSink(session, 'log', synchronous = True)
+    sink.log('stage', 'first message')
+    messages = sink.to_pandas()['message'].tolist()
+    assert messages[0] == 'first message'
+    assert messages[1].startswith('Error writing to log')
+    # The failed entries stay buffered and are written by the next flush
+    sink.flush()
+    assert sink.flushed_upto == 2
+    sink.close()
+
+
+def test_sink_without_session_keeps_rows_in_memory():
+    sink = LogSink(None, 'log', synchronous = True)
+    sink.log('stage', 'message')
+    sink.close()
+    assert sink.to_pandas()['message'].tolist() == ['message']
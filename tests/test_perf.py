@@ -0,0 +1,46 @@
+from regression_perf import MODEL_SPAN, PerfRecorder
+
+
+class FailingSession:
+    """
+    Session whose statements all fail, like a perf table that cannot be written
+    """
+
+    def sql(self, sql_cmd:str):
+        return self
+
+    def collect(self):
+        raise RuntimeError('insert failed')
+
+
+class TagBackend:
+    def __init__(self):
+        self.query_tags = []
+
+    def set_query_tag(self, query_tag:str):
+        self.query_tags.append(query_tag)
+
+
+def test_spans_carry_the_model_and_its_query_tag():
+    backend = TagBackend()
+    recorder = PerfRecorder(backend, 'perf', 'run_1')
+    with recorder.model('orders'):
+        with recorder.span('fingerprint') as span:
+            span.fetched(rows = 1)
+    assert backend.query_tags == ['regression_test:run_1:ORDERS', None]
+    assert [(row[1], row[2], row[5]) for row in recorder.sink.rows] == [('ORDERS', 'fingerprint', 1), ('ORDERS', MODEL_SPAN, None)]
+    assert recorder.slowest_models()[0]['model_name'] == 'ORDERS'
+
+
+def test_a_failed_perf_write_does_not_fail_the_stage():
+    recorder = PerfRecorder(TagBackend(), 'perf', 'run_1', FailingSession())
+    recorder.sink.synchronous = True
+    with recorder.span('compare', 'ORDERS'):
+        result = 'compared'
+    assert result == 'compared'
+    assert str(recorder.write_error) == 'insert failed'
+    # The span stays buffered for a later write
+    assert len(recorder.sink.rows) == 1 and recorder.sink.flushed_upto == 0
+    # The perf table stays unwritable, drop the session so nothing is retried at exit
+    recorder.sink.session = None
+    recorder.close()
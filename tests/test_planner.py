@@ -0,0 +1,61 @@
+import pytest
+from regression_planner import STRATEGY_HASH, STRATEGY_SAMPLE, STRATEGY_DRILLDOWN, STRATEGY_JOIN, STRATEGY_MEMORY, plan_model, apply_plan
+
+
+def stats(rows:int, size:int = 1000) -> dict:
+    return {'row_count': rows, 'bytes': size, 'last_altered': None}
+
+
+def plan(rows:int, keyed:bool, column_count:int = 10, **options) -> dict:
+    config = dict({'name': 'orders', 'primary_key': 'ID' if keyed else None}, **options)
+    return plan_model(config, stats(rows), stats(rows), column_count)
+
+
+@pytest.mark.parametrize('rows, keyed, strategy', [
+    (1000, True, STRATEGY_JOIN),
+    (1000, False, STRATEGY_MEMORY),
+    (10000000, True, STRATEGY_JOIN),
+    (10000000, False, STRATEGY_DRILLDOWN),
+    (1000000000, True, STRATEGY_SAMPLE),
+    (1000000000, False, STRATEGY_HASH),
+])
+def test_strategy_follows_size_and_key(rows, keyed, strategy):
+    assert plan(rows, keyed)['strategy'] == strategy
+
+
+def test_huge_keyed_models_are_sampled_with_the_default_fraction():
+    assert plan(1000000000, True)['sample'] == 0.01
+
+
+def test_column_groups_apply_the_memory_limits_per_group():
+    assert plan(1000000, False, column_count = 200)['strategy'] == STRATEGY_DRILLDOWN
+    assert plan(1000000, False, column_count = 200, column_groups = 10)['strategy'] == STRATEGY_MEMORY
+
+
+def test_config_block_overrides_the_planner():
+    assert plan(1000, False, strategy = 'hash')['override'] is True
+    assert plan(1000, False, drilldown = {'buckets': 8})['strategy'] == STRATEGY_DRILLDOWN
+    with pytest.raises(ValueError):
+        plan(1000, False, strategy = 'join')
+    with pytest.raises(ValueError):
+        plan(1000, True, strategy = 'fastest')
+
+
+def test_memory_strategy_keeps_the_join_diff_of_keyed_models():
+    keyed = {'name': 'orders', 'primary_key': 'ID', 'drilldown': {'buckets': 8}}
+    assert 'key_diff' not in apply_plan(keyed, {'strategy': STRATEGY_MEMORY})
+    unkeyed = {'name': 'orders'}
+    assert apply_plan(unkeyed, {'strategy': STRATEGY_MEMORY}) == {'name': 'orders', 'drilldown': {}, 'key_diff': False}
+
+
+def test_apply_plan_does_not_change_the_config_block():
+    config = {'name': 'orders', 'primary_key': 'ID'}
+    apply_plan(config, {'strategy': STRATEGY_SAMPLE, 'sample': 0.05})
+    assert config == {'name': 'orders', 'primary_key': 'ID'}
+
+
+def test_a_sample_of_1_does_not_select_the_sample_strategy():
+    assert plan(1000, True, sample = 1)['strategy'] == STRATEGY_JOIN
+    assert plan(1000, True, sample = 0.1)['strategy'] == STRATEGY_SAMPLE
+    # A huge model whose config asks for the whole model is not sampled with the default fraction
+    assert 'sample' not in plan(1000000000, True, sample = 1)
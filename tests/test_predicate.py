@@ -0,0 +1,44 @@
+import pytest
+from regression_predicate import Condition, parse_predicate
+
+
+def test_operators_compile_to_sql():
+    assert Condition('sale_date', 'between', ['2025-01-01', '2025-01-07'], 'date').to_sql() == \
+        """"SALE_DATE" between '2025-01-01'::date and '2025-01-07'::date"""
+    assert Condition('region', 'not in', ['EU', 'US']).to_sql() == """"REGION" not in ('EU','US')"""
+    assert Condition('amount', '==', 10).to_sql() == '"AMOUNT" = 10'
+    assert Condition('deleted_at', 'IS  NULL').to_sql() == '"DELETED_AT" is null'
+    assert Condition('updated_at', 'last_n_hours', '6').to_sql() == '"UPDATED_AT" >= dateadd(hour, -6, current_timestamp)'
+
+
+def test_values_and_identifiers_are_escaped():
+    assert Condition('name', '=', "O'Brien").to_sql() == """"NAME" = 'O''Brien'"""
+    assert Condition('a"b', '=', 'x').to_sql() == """"A""B" = 'x'"""
+
+
+@pytest.mark.parametrize('column, operator, value, value_type', [
+    ('', '=', 1, None),
+    ('ID', 'like', '%a', None),
+    ('ID', 'in', [], None),
+    ('ID', 'between', [1], None),
+    ('ID', '=', [1, 2], None),
+    ('ID', 'last_n_days', 'seven', None),
+    ('ID', '=', 1, 'uuid'),
+])
+def test_invalid_conditions_are_rejected(column, operator, value, value_type):
+    with pytest.raises(ValueError):
+        Condition(column, operator, value, value_type)
+
+
+def test_predicate_combines_the_single_filter_and_the_filters_list():
+    predicate = parse_predicate({'filter_column': 'region', 'filter_operator': '=', 'filter_column_value': 'EU',
+                                 'filters': [{'column': 'amount', 'operator': '>', 'value': 0, 'type': 'number'}]})
+    assert predicate.to_sql() == """("REGION" = 'EU') and ("AMOUNT" > 0::number)"""
+    assert predicate.columns == ['AMOUNT', 'REGION']
+    assert parse_predicate({}).to_sql() is None
+
+
+def test_predicate_rejects_unknown_columns():
+    predicate = parse_predicate({'filters': [{'column': 'missing', 'operator': 'is not null'}]})
+    with pytest.raises(ValueError):
+        predicate.validate(['ID', 'NAME'])
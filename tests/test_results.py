@@ -0,0 +1,108 @@
+import pandas
+import pytest
+from regression_sql import EQUAL_RESULT
+from regression_sample import SAMPLE_LABEL
+from regression_results import STATUS_PASS, STATUS_FAIL, STATUS_ERROR, ResultCollector, results_table_ddl, result_status, diff_rows_json, model_verdict_sql, outcome_sql
+
+
+def test_result_status():
+    assert result_status(EQUAL_RESULT) == STATUS_PASS
+    assert result_status('Rows changed : 1.') == STATUS_FAIL
+    assert result_status('None') == STATUS_ERROR
+    assert result_status(None) == STATUS_ERROR
+    assert result_status(SAMPLE_LABEL + '1.0000% of rows.\n' + EQUAL_RESULT) == STATUS_PASS
+
+
+def test_diff_rows_json_flattens_the_compare_header():
+    df_results = pandas.DataFrame([[1, 2]], columns = pandas.MultiIndex.from_tuples([('AMOUNT', 'self'), ('AMOUNT', 'other')]))
+    assert diff_rows_json(df_results) == '[{"AMOUNT_self":1,"AMOUNT_other":2}]'
+
+
+def results(*runs) -> pandas.DataFrame:
+    """
+    Results table of the given runs, a run being (run_id, [(model, resultset)]), the last run written last
+    """
+    collector = ResultCollector(None, 'regression_results', 'validation_regression')
+    for position, (run_id, model_list) in enumerate(runs):
+        for model, resultset in model_list:
+            collector.add(run_id, 'db', 'sales', model, resultset, {'rows_changed': 0 if resultset == EQUAL_RESULT else 1})
+        for row in collector.rows:
+            if row['RUN_ID'] == run_id:
+                row['CREATED_AT'] = pandas.Timestamp('2026-01-01') + pandas.Timedelta(minutes = position)
+    return collector.to_pandas()
+
+
+@pytest.fixture
+def connection():
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    yield connection
+    connection.close()
+
+
+def query(connection, df:pandas.DataFrame, sql_cmd:str) -> list:
+    connection.register('regression_results', df)
+    df = connection.execute(sql_cmd).df()
+    df.columns = [col.upper() for col in df.columns]
+    return df.to_dict('records')
+
+
+def test_outcome_of_the_latest_run_only(connection):
+    df = results(('run_1', [('orders', 'Rows changed : 1.')]),
+                 ('run_2', [('orders', EQUAL_RESULT), ('customers', EQUAL_RESULT)]))
+    outcome = query(connection, df, outcome_sql('regression_results'))[0]
+    assert (outcome['RESULT'], outcome['RUN_ID'], outcome['PASSED'], outcome['FAILED'], outcome['ERRORED']) == ('TRUE', 'run_2', 2, 0, 0)
+
+
+def test_outcome_fails_on_a_failed_or_errored_model(connection):
+    df = results(('run_1', [('orders', EQUAL_RESULT), ('customers', 'Rows changed : 1.'), ('items', 'None')]))
+    outcome = query(connection, df, outcome_sql('regression_results'))[0]
+    assert (outcome['RESULT'], outcome['PASSED'], outcome['FAILED'], outcome['ERRORED']) == ('FALSE', 1, 1, 1)
+
+
+def test_outcome_of_an_empty_run_is_false(connection):
+    assert query(connection, results(), outcome_sql('regression_results'))[0]['RESULT'] == 'FALSE'
+
+
+def test_model_verdicts_of_the_latest_run(connection):
+    df = results(('run_1', [('orders', 'Rows changed : 1.')]),
+                 ('run_2', [('orders', EQUAL_RESULT), ('customers', 'Rows changed : 1.')]))
+    verdicts = query(connection, df, model_verdict_sql('regression_results') + ' order by model_name')
+    assert [(row['RUN_ID'], row['MODEL_NAME'], row['STATUS'], row['ROWS_CHANGED']) for row in verdicts] == \
+           [('run_2', 'CUSTOMERS', STATUS_FAIL, 1), ('run_2', 'ORDERS', STATUS_PASS, 0)]
+
+
+class DuckSession:
+    """
+    Session double running statements and write_pandas on a DuckDB connection
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.connection.execute("""create macro parse_json(value) as value::json""")
+
+    def sql(self, sql_cmd:str):
+        self.connection.execute(sql_cmd)
+        return self
+
+    def collect(self) -> list:
+        return self.connection.fetchall()
+
+    def write_pandas(self, df, table_name:str, schema:str = None, table_type:str = None, **kwargs):
+        assert table_type == 'temporary'
+        self.connection.register('written', df)
+        self.connection.execute(f"""create or replace table {schema}.{table_name} as select * from written""")
+
+
+def test_diff_rows_are_loaded_as_json_documents(connection):
+    ddl = results_table_ddl('validation_regression.regression_results').replace(' cluster by (run_id)', '')
+    assert 'DIFF_ROWS variant' in ddl
+    connection.execute('create schema validation_regression')
+    connection.execute(ddl.replace('variant', 'json').replace('timestamp_ntz', 'timestamp').replace('number', 'bigint'))
+    collector = ResultCollector(DuckSession(connection), 'regression_results', 'validation_regression')
+    collector.add('run_1', 'db', 'sales', 'orders', 'Rows changed : 1.', {'diff_rows': '[{"ID":3,"AMOUNT_REF":30,"AMOUNT_REGRESSION":31}]'})
+    collector.add('run_1', 'db', 'sales', 'customers', EQUAL_RESULT)
+    assert collector.write() == 2
+    rows = connection.execute("""select model_name, diff_rows->0->>'AMOUNT_REF' from validation_regression.regression_results order by 1""").fetchall()
+    assert rows == [('CUSTOMERS', None), ('ORDERS', '30')]
+    assert collector.rows == []
@@ -0,0 +1,49 @@
+import pytest
+from regression_sample import SAMPLE_LABEL, parse_sample, sample_fraction, sample_condition, wilson_interval, sample_report
+
+
+def test_parse_sample():
+    assert parse_sample({}) is None
+    assert parse_sample({'sample': 1}) is None
+    assert parse_sample({'sample': 0.05}) == {'fraction': 0.05}
+    assert parse_sample({'sample': '20000'}) == {'rows': 20000}
+    with pytest.raises(ValueError):
+        parse_sample({'sample': -1})
+
+
+@pytest.mark.parametrize('value', [1, 1.0, '1'])
+def test_a_sample_of_1_is_the_whole_model(value):
+    assert parse_sample({'sample': value}) is None
+
+
+def test_row_counts_are_whole_numbers_above_1():
+    assert parse_sample({'sample': 2}) == {'rows': 2}
+    assert parse_sample({'sample': 1000.0}) == {'rows': 1000}
+    with pytest.raises(ValueError):
+        parse_sample({'sample': 1.5})
+
+
+def test_sample_fraction_of_a_row_count():
+    assert sample_fraction({'fraction': 0.1}, 1000) == 0.1
+    assert sample_fraction({'rows': 100}, 1000) == 0.1
+    assert sample_fraction({'rows': 5000}, 1000) == 1.0
+    assert sample_fraction({'rows': 100}, None) == 1.0
+
+
+def test_sample_condition_keeps_at_least_one_slot():
+    assert sample_condition(['ID'], 0.01) == 'mod(abs(hash("ID")), 1000000) < 10000'
+    assert sample_condition(['ID'], 0.0).endswith('< 1')
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(10, 1000)
+    assert low < 0.01 < high
+    low, high = wilson_interval(0, 1000)
+    assert low == 0.0 and high < 0.01
+
+
+def test_sample_report_counts_a_changed_row_once():
+    report = sample_report(0.01, {'REF_ROWS': 1000, 'REGRESSION_ROWS': 1000, 'ROWS_ADDED': 5, 'ROWS_REMOVED': 5})
+    assert report.startswith(SAMPLE_LABEL)
+    assert 'Mismatched rows : 5.' in report
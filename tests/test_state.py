@@ -0,0 +1,94 @@
+from regression_state import RunState, config_hash, model_key
+
+
+def test_config_hash_covers_the_config_the_excluded_columns_and_the_run_options():
+    config = {'name': 'orders', 'database': 'db', 'schema': 'sales'}
+    digest = config_hash(config, ['B', 'A'])
+    assert digest == config_hash(dict(config), ['A', 'B'])
+    assert digest != config_hash(dict(config, primary_key = 'ID'), ['A', 'B'])
+    assert digest != config_hash(config, ['A'])
+    assert config_hash(config, [], {'strategy': 'join', 'diff_limit': 10}) != config_hash(config, [], {'strategy': 'hash', 'diff_limit': 10})
+    assert config_hash(config, [], {'strategy': 'join', 'diff_limit': 10}) != config_hash(config, [], {'strategy': 'join', 'diff_limit': 50})
+
+
+def test_model_key():
+    assert model_key({'name': 'orders', 'database': 'db', 'schema': 'sales'}) == 'DB.SALES.ORDERS'
+
+
+class StateSession:
+    """
+    Session double recording statements, whose queries return no rows
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def sql(self, sql_cmd:str):
+        self.statements.append(sql_cmd)
+        return self
+
+    def collect(self) -> list:
+        return []
+
+
+REF_STATS = {'row_count': 4, 'last_altered': '2026-01-01 00:00:00', 'bytes': 100}
+REGRESSION_STATS = {'row_count': 4, 'last_altered': '2026-01-02 00:00:00', 'bytes': 100}
+
+
+def recorded_state(**measures) -> dict:
+    run_state = RunState(StateSession(), 'run_state')
+    run_state.record('DB.SALES.ORDERS', 'digest', REF_STATS, REGRESSION_STATS, measures, 'Rows changed : 1.', 'run_1')
+    run_state.flush()
+    return run_state.lookup('DB.SALES.ORDERS')
+
+
+def test_metadata_unchanged():
+    state = recorded_state()
+    assert RunState.metadata_unchanged(state, 'digest', REF_STATS, REGRESSION_STATS)
+    assert not RunState.metadata_unchanged(state, 'other digest', REF_STATS, REGRESSION_STATS)
+    assert not RunState.metadata_unchanged(state, 'digest', REF_STATS, dict(REGRESSION_STATS, row_count = 5))
+    assert not RunState.metadata_unchanged(state, 'digest', REF_STATS, dict(REGRESSION_STATS, last_altered = '2026-01-03 00:00:00'))
+    assert not RunState.metadata_unchanged(state, 'digest', REF_STATS, dict(REGRESSION_STATS, last_altered = None))
+    assert not RunState.metadata_unchanged(None, 'digest', REF_STATS, REGRESSION_STATS)
+
+
+def test_fingerprint_unchanged():
+    state = recorded_state(ref_fingerprint = 1, regression_fingerprint = 2)
+    assert RunState.fingerprint_unchanged(state, 'digest', {'ref_fingerprint': 1, 'regression_fingerprint': 2})
+    assert not RunState.fingerprint_unchanged(state, 'digest', {'ref_fingerprint': 1, 'regression_fingerprint': 3})
+    assert not RunState.fingerprint_unchanged(state, 'other digest', {'ref_fingerprint': 1, 'regression_fingerprint': 2})
+    assert not RunState.fingerprint_unchanged(recorded_state(), 'digest', {'ref_fingerprint': None, 'regression_fingerprint': None})
+
+
+def test_states_keep_the_measures_of_the_verdict_and_are_written_with_one_merge():
+    run_state = RunState(StateSession(), 'run_state')
+    run_state.create()
+    assert run_state.session.statements[1].startswith('alter table run_state add column if not exists rows_added number')
+    run_state.record('DB.SALES.ORDERS', 'digest', REF_STATS, REGRESSION_STATS,
+                     {'rows_changed': 1, 'diff_rows': '[{"ID":3}]', 'strategy': 'join'}, 'Rows changed : 1.', 'run_1')
+    run_state.record('DB.SALES.ITEMS', 'digest', REF_STATS, REGRESSION_STATS, None, 'The data frames are equal', 'run_1')
+    run_state.flush()
+    assert len(run_state.session.statements) == 3 and run_state.session.statements[2].startswith('merge into run_state')
+    state = run_state.lookup('DB.SALES.ORDERS')
+    assert (state['rows_changed'], state['diff_rows'], state['rows_added']) == (1, '[{"ID":3}]', None)
+    assert 'strategy' not in state
+
+
+def test_a_reused_verdict_keeps_its_diff_counts(engine, export, monkeypatch):
+    from regression_results import ResultCollector
+    export('SALES', 'ORDERS', """select * from (values (1, 10), (2, 20), (3, 30)) t("ID", "AMOUNT")""")
+    export('SALES_REGRESSION', 'ORDERS', """select * from (values (1, 10), (3, 31), (4, 40)) t("ID", "AMOUNT")""")
+    monkeypatch.setattr(engine, 'run_state', RunState(StateSession(), 'run_state'))
+    monkeypatch.setattr(engine, 'result_collector', ResultCollector(None, 'regression_results', 'validation_regression'))
+    config_block = {'name': 'ORDERS', 'database': 'DB', 'schema': 'SALES', 'primary_key': 'ID'}
+    for run_id in ('run_1', 'run_2'):
+        monkeypatch.setattr(engine, 'run_id', run_id)
+        resultset = engine.regression_model(None, dict(config_block), [])
+        engine.run_state.flush()
+    assert resultset.startswith('Rows added : 1. Rows removed : 1. Rows changed : 1.')
+    assert engine.run_state.lookup('DB.SALES.ORDERS')['run_id'] == 'run_2'
+    assert any('unchanged since run run_1' in message for message in engine.log_sink.to_pandas()['message'])
+    first, reused = engine.result_collector.to_pandas().to_dict('records')
+    assert reused['RUN_ID'] == 'run_2' and reused['RESULT'] == first['RESULT']
+    for col in ('ROWS_ADDED', 'ROWS_REMOVED', 'ROWS_CHANGED', 'DIFF_ROWS'):
+        assert reused[col] == first[col]
@@ -0,0 +1,36 @@
+class AsyncQueries:
+    """
+    Submit several queries at once as Snowpark async jobs and gather their results later.
+    The warehouse works on all submitted queries at the same time, so waiting for a group of queries
+    costs the slowest query rather than the sum of all of them
+    """
+
+    def __init__(self, session, statement_params:dict = None):
+        self.session = session
+        self.statement_params = statement_params
+        self.jobs = {}
+
+    def submit(self, name:str, sql_cmd:str):
+        """
+        Submit a query without waiting for it
+        """
+        self.jobs[name] = self.session.sql(sql_cmd).collect_nowait(statement_params=self.statement_params)
+        return self
+
+    def __contains__(self, name:str) -> bool:
+        return name in self.jobs
+
+    def result(self, name:str, result_type:str = 'row'):
+        """
+        Wait for a submitted query and return its result as rows ('row') or a pandas DataFrame ('pandas')
+        """
+        return self.jobs.pop(name).result(result_type)
+
+    def cancel(self, *names):
+        """
+        Cancel pending queries whose results are no longer needed, all of them when no name is given
+        """
+        for name in (names or list(self.jobs)):
+            job = self.jobs.pop(name, None)
+            if job is not None and not job.is_done():
+                job.cancel()
@@ -0,0 +1,238 @@
+import glob
+import os
+import re
+import threading
+import pandas
+from regression_sql import quote_ident, where_clause, model_tables, fingerprint_sql
+from regression_drilldown import bucket_expr, bucket_hash_sql
+from regression_async import AsyncQueries
+from regression_catalog import Catalog
+
+
+# Snowflake names of the DuckDB types of a Parquet export, so data type validation reads the same on both backends
+LOCAL_TYPES = {'VARCHAR': 'TEXT', 'BOOLEAN': 'BOOLEAN', 'DATE': 'DATE', 'TIME': 'TIME', 'BLOB': 'BINARY',
+               'DOUBLE': 'FLOAT', 'FLOAT': 'FLOAT', 'TIMESTAMP': 'TIMESTAMP_NTZ', 'TIMESTAMP_NS': 'TIMESTAMP_NTZ',
+               'TIMESTAMP_MS': 'TIMESTAMP_NTZ', 'TIMESTAMP_S': 'TIMESTAMP_NTZ', 'TIMESTAMP WITH TIME ZONE': 'TIMESTAMP_TZ'}
+LOCAL_INTEGER_TYPES = ['TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT']
+
+
+def local_column_type(column_name:str, ordinal_position:int, column_type:str) -> dict:
+    """
+    Catalog column row of a Parquet column, with the Snowflake data type, precision, radix and scale
+    """
+    column = {'COLUMN_NAME': column_name.upper(), 'ORDINAL_POSITION': ordinal_position, 'DATA_TYPE': LOCAL_TYPES.get(column_type, column_type),
+              'CHARACTER_MAXIMUM_LENGTH': None, 'NUMERIC_PRECISION': None, 'NUMERIC_PRECISION_RADIX': None, 'NUMERIC_SCALE': None}
+    decimal = re.match(r'DECIMAL\((\d+),\s*(\d+)\)', column_type)
+    if decimal:
+        column.update({'DATA_TYPE': 'NUMBER', 'NUMERIC_PRECISION': int(decimal.group(1)), 'NUMERIC_PRECISION_RADIX': 10, 'NUMERIC_SCALE': int(decimal.group(2))})
+    elif column_type in LOCAL_INTEGER_TYPES:
+        column.update({'DATA_TYPE': 'NUMBER', 'NUMERIC_PRECISION': 38, 'NUMERIC_PRECISION_RADIX': 10, 'NUMERIC_SCALE': 0})
+    return column
+
+
+
+class SnowparkBackend:
+    """
+    Compare backend running every query in Snowflake through a Snowpark session.
+    Metadata comes from the INFORMATION_SCHEMA catalog and dataframes are read with the modin Snowflake plugin.
+    The queries of a thread carry the QUERY_TAG set with set_query_tag()
+    """
+
+    name = 'snowpark'
+    # Stages of the engine the backend cannot run
+    unsupported = ()
+
+    def __init__(self, session, catalog:Catalog = None):
+        self.session = session
+        self.catalog = catalog or Catalog(session)
+        self.local = threading.local()
+
+    def set_query_tag(self, query_tag:str):
+        self.local.query_tag = query_tag
+
+    def statement_params(self) -> dict:
+        query_tag = getattr(self.local, 'query_tag', None)
+        return {'QUERY_TAG': query_tag} if query_tag else None
+
+    def model_tables(self, database:str, model:str, schema:str) -> tuple:
+        return model_tables(database, model, schema)
+
+    def query(self, sql_cmd:str) -> list:
+        return self.session.sql(sql_cmd).collect(statement_params=self.statement_params())
+
+    def query_pandas(self, sql_cmd:str) -> pandas.DataFrame:
+        return self.session.sql(sql_cmd).to_pandas(statement_params=self.statement_params())
+
+    def read(self, sql_cmd:str):
+        """
+        Dataframe of a query, compared where it lives in Snowflake. The modin reads carry the query tag of the session only
+        """
+        # Imported on first use, so the engine also loads where the Snowflake packages are not installed
+        import modin.pandas as pd
+        import snowflake.snowpark.modin.plugin
+        return pd.read_snowflake(sql_cmd)
+
+    def fingerprint_sql(self, model_name_ref:str, model_name_regression:str, column_list:list, condition:str = None) -> str:
+        return fingerprint_sql(model_name_ref, model_name_regression, column_list, condition)
+
+    def bucket_hash_sql(self, model_name_ref:str, model_name_regression:str, hash_column_list:list, column_list:list, modulus:int, condition:str = None) -> str:
+        return bucket_hash_sql(model_name_ref, model_name_regression, hash_column_list, column_list, modulus, condition)
+
+    def async_queries(self) -> AsyncQueries:
+        return AsyncQueries(self.session, self.statement_params())
+
+
+
+class LocalCatalog(Catalog):
+    """
+    Catalog of the Parquet exports of a local backend. Columns and types come from the Parquet schema,
+    row counts from the Parquet metadata, bytes and last altered time from the files
+    """
+
+    def __init__(self, backend):
+        super().__init__(None)
+        self.backend = backend
+
+    def load(self, table_list:list):
+        resolved = {}
+        for database, schema, model in table_list:
+            key = self.table_key(database, schema, model)
+            if key in self.tables or key in resolved:
+                continue
+            files = self.backend.files(*key)
+            if not files:
+                resolved[key] = None
+                continue
+            source = self.backend.table_sql(*key)
+            description = self.backend.query(f"""describe select * from {source}""")
+            resolved[key] = {'row_count': self.backend.query(f"""select count(*) row_count from {source}""")[0]['ROW_COUNT'],
+                             'bytes': sum(os.path.getsize(path) for path in files),
+                             'last_altered': pandas.Timestamp(max(os.path.getmtime(path) for path in files), unit='s'),
+                             'columns': [local_column_type(row['COLUMN_NAME'], position + 1, row['COLUMN_TYPE'])
+                                         for position, row in enumerate(description)]}
+        with self.lock:
+            self.tables.update(resolved)
+            self.queries += 1
+
+
+
+class LocalBackend:
+    """
+    Compare backend running the queries in an in-process DuckDB database over Parquet exports of the
+    reference and regression tables, without a warehouse. DATABASE.SCHEMA.MODEL is read from
+    <root>/DATABASE/SCHEMA/MODEL.parquet or from every Parquet file of the directory <root>/DATABASE/SCHEMA/MODEL.
+    DuckDB scans, hashes and joins the files vectorized on all cores (or on threads cores)
+    """
+
+    name = 'local'
+    # Stages of the engine that need a warehouse: column profiles and baselines are stored in tables of
+    # validation_regression and spilled diffs are unloaded to a stage
+    unsupported = ('profile', 'baseline', 'spill')
+
+    def __init__(self, root:str, threads:int = None):
+        import duckdb
+        self.root = root
+        self.connection = duckdb.connect()
+        if threads:
+            self.connection.execute(f"""set threads = {int(threads)}""")
+        self.catalog = LocalCatalog(self)
+
+    def table_path(self, database:str, schema:str, model:str) -> str:
+        """
+        Parquet file, or glob of the Parquet files, of the export of a table
+        """
+        path = os.path.join(self.root, database.upper(), schema.upper(), model.upper())
+        return os.path.join(path, '*.parquet') if os.path.isdir(path) else path + '.parquet'
+
+    def files(self, database:str, schema:str, model:str) -> list:
+        """
+        Parquet files of a table, an empty list when the table was not exported
+        """
+        return sorted(glob.glob(self.table_path(database, schema, model)))
+
+    def table_sql(self, database:str, schema:str, model:str) -> str:
+        """
+        Table expression reading the Parquet export of a table, used where the SQL names a table
+        """
+        # DuckDB string literals take no backslash escapes, so sql_literal does not fit Windows paths
+        return "read_parquet('" + self.table_path(database, schema, model).replace("'", "''") + "')"
+
+    def model_tables(self, database:str, model:str, schema:str) -> tuple:
+        return (self.table_sql(database, schema, model), self.table_sql(database, schema + '_regression', model))
+
+    def query(self, sql_cmd:str) -> list:
+        """
+        Rows of a query as dictionaries keyed by upper case column names, like Snowpark rows
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql_cmd)
+            if cursor.description is None:
+                return []
+            names = [col[0].upper() for col in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def query_pandas(self, sql_cmd:str) -> pandas.DataFrame:
+        # A cursor per call, so models compared on several threads do not share one
+        cursor = self.connection.cursor()
+        try:
+            df = cursor.execute(sql_cmd).df()
+        finally:
+            cursor.close()
+        df.columns = [str(col).upper() for col in df.columns]
+        return df
+
+    def read(self, sql_cmd:str) -> pandas.DataFrame:
+        return self.query_pandas(sql_cmd)
+
+    def set_query_tag(self, query_tag:str):
+        """
+        DuckDB has no query tags
+        """
+
+    def fingerprint_sql(self, model_name_ref:str, model_name_regression:str, column_list:list, condition:str = None) -> str:
+        """
+        Row count and order independent fingerprint of both sides: the sum of the row hashes.
+        The fingerprints are only compared with each other, so they do not need to match HASH_AGG
+        """
+        columns = ','.join(quote_ident(col) for col in column_list)
+        return f"""with ref as (
+                    select count(*) num_rows, coalesce(sum(hash({columns})::hugeint), 0)::varchar fingerprint
+                    from {model_name_ref}{where_clause(condition)}
+                    ),
+                    regression as (
+                    select count(*) num_rows, coalesce(sum(hash({columns})::hugeint), 0)::varchar fingerprint
+                    from {model_name_regression}{where_clause(condition)}
+                    )
+                    select ref.num_rows ref_rows, ref.fingerprint ref_fingerprint,
+                    regression.num_rows regression_rows, regression.fingerprint regression_fingerprint
+                    from ref cross join regression"""
+
+    def bucket_hash_sql(self, model_name_ref:str, model_name_regression:str, hash_column_list:list, column_list:list, modulus:int, condition:str = None) -> str:
+        """
+        Per bucket row count and sum of the row hashes of both sides, DuckDB has no HASH_AGG. Only buckets that differ are returned
+        """
+        bucket = bucket_expr(hash_column_list, modulus)
+        columns = ','.join(quote_ident(col) for col in column_list)
+        return f"""with ref as (
+                    select {bucket} bucket, count(*) num_rows, sum(hash({columns})::hugeint) fingerprint
+                    from {model_name_ref}{where_clause(condition)} group by 1
+                    ),
+                    regression as (
+                    select {bucket} bucket, count(*) num_rows, sum(hash({columns})::hugeint) fingerprint
+                    from {model_name_regression}{where_clause(condition)} group by 1
+                    )
+                    select coalesce(ref.bucket, regression.bucket) bucket,
+                    coalesce(ref.num_rows, 0) ref_rows, coalesce(regression.num_rows, 0) regression_rows
+                    from ref full outer join regression on ref.bucket = regression.bucket
+                    where ref.fingerprint is distinct from regression.fingerprint
+                    or ref.num_rows is distinct from regression.num_rows
+                    order by 1"""
+
+    def async_queries(self) -> AsyncQueries:
+        """
+        DuckDB runs each query on all cores already, queries are not submitted ahead
+        """
+        return None
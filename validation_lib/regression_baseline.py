@@ -0,0 +1,173 @@
+import hashlib
+import threading
+from regression_log import sql_literal
+from regression_sql import quote_ident, where_clause
+from regression_diff import DIFF_ADDED, DIFF_REMOVED, DIFF_CHANGED
+
+
+def row_hash_expr(column_list:list, alias:str = None) -> str:
+    """
+    Hash of the compared columns of a row
+    """
+    prefix = alias + '.' if alias else ''
+    return 'hash(' + ','.join(prefix + quote_ident(col) for col in column_list) + ')'
+
+
+def baseline_ctas_sql(baseline_table:str, model_name_ref:str, key_column_list:list, column_list:list, condition:str = None) -> str:
+    """
+    Materialize the compact baseline of a reference model: one row hash per key, or the count of every
+    distinct row hash for models without a key. When every compared column is a key column the key itself is hashed
+    """
+    value_list = [col for col in column_list if col not in key_column_list] or key_column_list
+    if key_column_list:
+        keys = ','.join(quote_ident(col) for col in key_column_list)
+        return f"""create or replace table {baseline_table} as
+                    select {keys}, {row_hash_expr(value_list)} row_hash
+                    from {model_name_ref}{where_clause(condition)}"""
+    return f"""create or replace table {baseline_table} as
+                    select {row_hash_expr(column_list)} row_hash, count(*) num_rows
+                    from {model_name_ref}{where_clause(condition)} group by 1"""
+
+
+def side_fingerprint_sql(model_name:str, column_list:list, condition:str = None) -> str:
+    """
+    Row count and HASH_AGG of the compared columns of one side
+    """
+    columns = ','.join(quote_ident(col) for col in column_list)
+    return f"""select count(*) num_rows, hash_agg({columns}) fingerprint from {model_name}{where_clause(condition)}"""
+
+
+def baseline_diff_sql(baseline_table:str, model_name_regression:str, key_column_list:list, column_list:list, condition:str = None) -> str:
+    """
+    Differences between the regression model and the baseline of the reference model.
+    With a key every differing key is returned with a DIFF_TYPE. Without a key every row hash whose
+    count differs is returned with the number of rows ADDED or REMOVED. Keys are joined with IS NOT DISTINCT FROM so that NULL = NULL
+    """
+    value_list = [col for col in column_list if col not in key_column_list] or key_column_list
+    if key_column_list:
+        keys = ','.join(quote_ident(col) for col in key_column_list)
+        join_on = ' and '.join(f"""baseline.{quote_ident(col)} is not distinct from regression.{quote_ident(col)}""" for col in key_column_list)
+        key_values = ','.join(f"""coalesce(baseline.{quote_ident(col)}, regression.{quote_ident(col)}) {quote_ident(col)}""" for col in key_column_list)
+        return f"""with regression as (
+                    select {keys}, {row_hash_expr(value_list)} row_hash
+                    from {model_name_regression}{where_clause(condition)}
+                    )
+                    select {key_values},
+                    case when baseline.row_hash is null then '{DIFF_ADDED}'
+                         when regression.row_hash is null then '{DIFF_REMOVED}'
+                         else '{DIFF_CHANGED}' end diff_type, 1 num_rows
+                    from {baseline_table} baseline full outer join regression on {join_on}
+                    where baseline.row_hash is null or regression.row_hash is null or baseline.row_hash != regression.row_hash"""
+    return f"""with regression as (
+                    select {row_hash_expr(column_list)} row_hash, count(*) num_rows
+                    from {model_name_regression}{where_clause(condition)} group by 1
+                    )
+                    select coalesce(baseline.row_hash, regression.row_hash) row_hash,
+                    case when coalesce(regression.num_rows, 0) > coalesce(baseline.num_rows, 0) then '{DIFF_ADDED}' else '{DIFF_REMOVED}' end diff_type,
+                    abs(coalesce(regression.num_rows, 0) - coalesce(baseline.num_rows, 0)) num_rows
+                    from {baseline_table} baseline full outer join regression on baseline.row_hash = regression.row_hash
+                    where coalesce(baseline.num_rows, 0) != coalesce(regression.num_rows, 0)"""
+
+
+def baseline_counts_sql(diff_sql:str) -> str:
+    """
+    Number of added, removed and changed rows of a baseline diff
+    """
+    return f"""select
+                    coalesce(sum(case when diff_type = '{DIFF_ADDED}' then num_rows end), 0) rows_added,
+                    coalesce(sum(case when diff_type = '{DIFF_REMOVED}' then num_rows end), 0) rows_removed,
+                    coalesce(sum(case when diff_type = '{DIFF_CHANGED}' then num_rows end), 0) rows_changed,
+                    0 duplicate_keys
+                    from ({diff_sql})"""
+
+
+
+class BaselineStore:
+    """
+    Registry of the materialized reference baselines in validation_regression.
+    A baseline is valid while the config checksum, LAST_ALTERED and row count of the reference table
+    are the ones it was built from. Old baselines are evicted by count per model and by age.
+    Statements run through query (e.g. the query of the compare backend, so they carry its query tag), the session by default
+    """
+
+    def __init__(self, session, registry_table:str, schema:str = 'validation_regression', query = None):
+        self.session = session
+        self.query = query or (lambda sql_cmd: session.sql(sql_cmd).collect())
+        self.registry_table = registry_table
+        self.schema = schema
+        self.entries = {}
+        self.used = set()
+        self.lock = threading.Lock()
+
+    def create(self):
+        self.query(f"""create table if not exists {self.registry_table} ( model_name varchar, baseline_table varchar,
+                            config_hash varchar, ref_last_altered varchar, ref_rows number, ref_num_rows number, ref_fingerprint number,
+                            created_at timestamp, last_used_at timestamp )""")
+
+    def load(self):
+        """
+        Read the registry
+        """
+        rows = self.query(f"""select model_name, baseline_table, config_hash, ref_last_altered, ref_rows, ref_num_rows, ref_fingerprint
+                                    from {self.registry_table}""")
+        self.entries = {}
+        for row in rows:
+            self.entries.setdefault(row['MODEL_NAME'], []).append({name.lower(): row[name] for name in
+                                                                   ('MODEL_NAME', 'BASELINE_TABLE', 'CONFIG_HASH', 'REF_LAST_ALTERED', 'REF_ROWS', 'REF_NUM_ROWS', 'REF_FINGERPRINT')})
+        return self
+
+    def find(self, key:str, digest:str, ref_stats:dict) -> dict:
+        """
+        The valid baseline of a model, None when it has to be (re)built
+        """
+        if ref_stats['last_altered'] is None:
+            return None
+        for entry in self.entries.get(key, []):
+            if (entry['config_hash'] == digest and entry['ref_last_altered'] == str(ref_stats['last_altered'])
+                    and entry['ref_rows'] == ref_stats['row_count']):
+                with self.lock:
+                    self.used.add(entry['baseline_table'])
+                return entry
+        return None
+
+    def build(self, key:str, digest:str, ref_stats:dict, model_name_ref:str, key_column_list:list, column_list:list, condition:str = None) -> dict:
+        """
+        Materialize a new baseline of a reference model and register it
+        """
+        suffix = hashlib.md5((key + digest + str(ref_stats['last_altered'])).encode('utf-8')).hexdigest()[:16]
+        baseline_table = f"""{self.schema}.regression_baseline_{suffix}""".upper()
+        self.query(baseline_ctas_sql(baseline_table, model_name_ref, key_column_list, column_list, condition))
+        fingerprint = self.query(side_fingerprint_sql(model_name_ref, column_list, condition))[0]
+        entry = {'model_name': key, 'baseline_table': baseline_table, 'config_hash': digest,
+                 'ref_last_altered': None if ref_stats['last_altered'] is None else str(ref_stats['last_altered']),
+                 'ref_rows': ref_stats['row_count'], 'ref_num_rows': fingerprint['NUM_ROWS'], 'ref_fingerprint': fingerprint['FINGERPRINT']}
+        values = ','.join(sql_literal(entry[name]) for name in ('model_name', 'baseline_table', 'config_hash', 'ref_last_altered', 'ref_rows', 'ref_num_rows', 'ref_fingerprint'))
+        self.query(f"""insert into {self.registry_table} select {values}, current_timestamp, current_timestamp""")
+        with self.lock:
+            self.entries.setdefault(key, []).insert(0, entry)
+        return entry
+
+    def touch(self):
+        """
+        Mark the baselines used in this run with a single update
+        """
+        with self.lock:
+            used, self.used = sorted(self.used), set()
+        if used:
+            self.query(f"""update {self.registry_table} set last_used_at = current_timestamp
+                                where baseline_table in ({','.join(sql_literal(table) for table in used)})""")
+
+    def evict(self, keep:int = 3, ttl_days:int = 30) -> list:
+        """
+        Drop baselines beyond the keep most recent per model, and baselines not used for ttl_days days
+        """
+        rows = self.query(f"""select baseline_table from {self.registry_table}
+                                    qualify row_number() over (partition by model_name order by created_at desc) > {int(keep)}
+                                    or last_used_at < dateadd(day, -{int(ttl_days)}, current_timestamp)""")
+        evicted = [row['BASELINE_TABLE'] for row in rows]
+        for baseline_table in evicted:
+            self.query(f"""drop table if exists {baseline_table}""")
+        if evicted:
+            self.query(f"""delete from {self.registry_table}
+                                where baseline_table in ({','.join(sql_literal(table) for table in evicted)})""")
+        return evicted
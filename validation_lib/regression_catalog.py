@@ -0,0 +1,96 @@
+import threading
+from regression_log import sql_literal
+
+
+class Catalog:
+    """
+    Run wide cache of table metadata (columns, data types, row counts, bytes, last altered time)
+    read from INFORMATION_SCHEMA. All tables of a database are resolved with one query, so no table data is
+    touched to learn about columns or sizes
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.queries = 0
+
+    @staticmethod
+    def table_key(database:str, schema:str, model:str) -> tuple:
+        return (database.upper(), schema.upper(), model.upper())
+
+    def load(self, table_list:list):
+        """
+        Resolve metadata for a list of (database, schema, model) tables with one INFORMATION_SCHEMA query per database.
+        Tables that are already cached are not queried again. Tables that do not exist are cached as missing
+        """
+        pending = {}
+        with self.lock:
+            for database, schema, model in table_list:
+                key = self.table_key(database, schema, model)
+                if key not in self.tables:
+                    pending.setdefault(key[0], set()).add(key)
+        for database, keys in pending.items():
+            table_filter = ','.join('(' + sql_literal(schema) + ',' + sql_literal(model) + ')' for _, schema, model in sorted(keys))
+            sql_cmd = f"""select t.table_schema, t.table_name, t.row_count, t.bytes, t.last_altered,
+                            c.column_name, c.ordinal_position, c.data_type, c.character_maximum_length,
+                            c.numeric_precision, c.numeric_precision_radix, c.numeric_scale
+                            from {database}.information_schema.tables t
+                            join {database}.information_schema.columns c
+                            on c.table_schema = t.table_schema and c.table_name = t.table_name
+                            where (t.table_schema, t.table_name) in ({table_filter})
+                            order by t.table_schema, t.table_name, c.ordinal_position"""
+            rows = self.session.sql(sql_cmd).collect()
+            resolved = {key: None for key in keys}
+            for row in rows:
+                key = (database, row['TABLE_SCHEMA'], row['TABLE_NAME'])
+                if resolved.get(key) is None:
+                    resolved[key] = {'row_count': row['ROW_COUNT'], 'bytes': row['BYTES'], 'last_altered': row['LAST_ALTERED'], 'columns': []}
+                resolved[key]['columns'].append({name: row[name] for name in
+                                                 ('COLUMN_NAME', 'ORDINAL_POSITION', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH',
+                                                  'NUMERIC_PRECISION', 'NUMERIC_PRECISION_RADIX', 'NUMERIC_SCALE')})
+            with self.lock:
+                self.tables.update(resolved)
+                self.queries += 1
+
+    def load_models(self, config_list:list):
+        """
+        Resolve the reference and _regression tables of a list of config blocks in one go
+        """
+        table_list = []
+        for config in config_list:
+            table_list.append((config['database'], config['schema'], config['name']))
+            table_list.append((config['database'], config['schema'] + '_regression', config['name']))
+        self.load(table_list)
+
+    def table(self, database:str, schema:str, model:str) -> dict:
+        """
+        Cached metadata of a table, None when the table does not exist
+        """
+        key = self.table_key(database, schema, model)
+        if key not in self.tables:
+            self.load([key])
+        return self.tables.get(key)
+
+    def columns(self, database:str, schema:str, model:str) -> list:
+        """
+        Column names of a table in ordinal order
+        """
+        table = self.table(database, schema, model)
+        return [col['COLUMN_NAME'] for col in table['columns']] if table else []
+
+    def column_types(self, database:str, schema:str, model:str) -> list:
+        """
+        Column metadata rows (name, position, data type, length, precision, radix, scale) of a table
+        """
+        table = self.table(database, schema, model)
+        return list(table['columns']) if table else []
+
+    def stats(self, database:str, schema:str, model:str) -> dict:
+        """
+        Row count, bytes and last altered time of a table
+        """
+        table = self.table(database, schema, model)
+        if not table:
+            return {'row_count': None, 'bytes': None, 'last_altered': None}
+        return {name: table[name] for name in ('row_count', 'bytes', 'last_altered')}
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import re
+import threading
+import pandas
+from regression_log import sql_literal
+
+
+# Files of the configs stage: the latest release notes and the regression config
+RELEASE_FILE_PATTERN = r'release_v.*\.json$'
+CONFIG_FILE_NAME = 'regression_config.json'
+
+# Parsed configs of this process by checksum, shared by every loader
+_memory_cache = {}
+_memory_lock = threading.Lock()
+
+
+def parse_release(document) -> dict:
+    """
+    Models impacted by the current release (the first entry of releases) with their changed columns, upper-cased
+    """
+    if isinstance(document, (str, bytes)):
+        document = json.loads(document)
+    try:
+        release_items = document['releases'][0]['models_impacted']
+    except (KeyError, IndexError, TypeError):
+        raise ValueError("""Release file has no releases[0].models_impacted""")
+    if not isinstance(release_items, dict):
+        raise ValueError(f"""models_impacted of the release file must map models to column lists, got {type(release_items).__name__}""")
+    for model, column_list in release_items.items():
+        if not isinstance(column_list, list) or not all(isinstance(col, str) for col in column_list):
+            raise ValueError(f"""Changed columns of model {model} in the release file must be a list of column names""")
+    return {model.upper(): [col.upper() for col in column_list] for model, column_list in release_items.items()}
+
+
+def parse_config(document) -> list:
+    """
+    Config blocks of the regression config, each with a name, database and schema
+    """
+    if isinstance(document, (str, bytes)):
+        document = json.loads(document)
+    if not isinstance(document, list):
+        raise ValueError(f"""{CONFIG_FILE_NAME} must hold a list of config blocks""")
+    for position, config_block in enumerate(document):
+        if not isinstance(config_block, dict):
+            raise ValueError(f"""Config block {position} of {CONFIG_FILE_NAME} is not an object""")
+        for key in ('name', 'database', 'schema'):
+            if not isinstance(config_block.get(key), str):
+                raise ValueError(f"""Config block {position} of {CONFIG_FILE_NAME} has no {key}""")
+    return document
+
+
+
+class ConfigLoader:
+    """
+    Load the latest release notes and the regression config, from the configs stage or from local files.
+    On the stage one LIST gives the MD5 of both files. The parsed configs are cached by that checksum in this
+    process and in a table, so unchanged files are neither read nor parsed again.
+    Both files are read with a single query when they changed
+    """
+
+    def __init__(self, session = None, stage:str = 'validation_regression.configs',
+                 cache_table:str = 'validation_regression.regression_config_cache',
+                 file_format:str = 'validation_regression.config_format'):
+        self.session = session
+        self.stage = stage
+        self.cache_table = cache_table
+        self.file_format = file_format
+        self.queries = 0
+
+    def sql(self, sql_cmd:str) -> list:
+        self.queries += 1
+        return self.session.sql(sql_cmd).collect()
+
+    def list_files(self) -> tuple:
+        """
+        Name and MD5 of the latest release file and of the regression config in the stage
+        """
+        files = pandas.DataFrame([{'name': row['name'].split('/')[-1], 'md5': row['md5'], 'last_modified': row['last_modified']}
+                                  for row in self.sql(f"""LIST @{self.stage}""")], columns=['name', 'md5', 'last_modified'])
+        releases = files[files['name'].str.contains(RELEASE_FILE_PATTERN)]
+        configs = files[files['name'] == CONFIG_FILE_NAME]
+        if releases.empty or configs.empty:
+            raise FileNotFoundError(f"""@{self.stage} holds no release_v*.json or no {CONFIG_FILE_NAME}""")
+        release = releases.loc[pandas.to_datetime(releases['last_modified']).idxmax()]
+        config = configs.iloc[0]
+        return (release['name'], release['md5']), (config['name'], config['md5'])
+
+    def load(self) -> dict:
+        """
+        Parsed release items and config blocks of the stage files, from a cache when the files did not change
+        """
+        (release_file, release_md5), (config_file, config_md5) = self.list_files()
+        checksum = hashlib.md5(f"""{release_file}:{release_md5}:{config_file}:{config_md5}""".encode('utf-8')).hexdigest()
+        loaded = self.cached(checksum)
+        if loaded is None:
+            documents = self.fetch(release_file, config_file)
+            loaded = self.remember(checksum, parse_release(documents[release_file]), parse_config(documents[config_file]), persist = True)
+            loaded['cached'] = None
+        loaded.update({'release_file': '@' + self.stage + '/' + release_file, 'config_file': '@' + self.stage + '/' + config_file})
+        return loaded
+
+    def load_local(self, release_path:str, config_path:str) -> dict:
+        """
+        Parsed release items and config blocks of local files, cached by their content in this process
+        """
+        with open(release_path, 'rb') as release, open(config_path, 'rb') as config:
+            release_text, config_text = release.read(), config.read()
+        checksum = hashlib.md5(release_text + b'\0' + config_text).hexdigest()
+        with _memory_lock:
+            loaded = _memory_cache.get(checksum)
+        if loaded is not None:
+            loaded = dict(loaded, cached = 'memory')
+        else:
+            loaded = dict(self.remember(checksum, parse_release(release_text), parse_config(config_text)), cached = None)
+        loaded.update({'release_file': release_path, 'config_file': config_path})
+        return loaded
+
+    def cached(self, checksum:str) -> dict:
+        """
+        Configs parsed before for a checksum, from this process or else from the cache table
+        """
+        with _memory_lock:
+            loaded = _memory_cache.get(checksum)
+        if loaded is not None:
+            return dict(loaded, cached = 'memory')
+        try:
+            rows = self.sql(f"""select release_items, config_list from {self.cache_table} where checksum = {sql_literal(checksum)}""")
+        except Exception:
+            # The cache table does not exist yet
+            return None
+        if not rows:
+            return None
+        return dict(self.remember(checksum, json.loads(rows[0]['RELEASE_ITEMS']), json.loads(rows[0]['CONFIG_LIST'])), cached = 'table')
+
+    def fetch(self, release_file:str, config_file:str) -> dict:
+        """
+        Read both files with one query. Returns the text of every file by name
+        """
+        self.sql(f"""create file format if not exists {self.file_format} type = 'json'""")
+        pattern = '.*(' + '|'.join(re.escape(name) for name in (release_file, config_file)) + ')'
+        rows = self.sql(f"""select metadata$filename file_name, $1 content from @{self.stage}
+                            (file_format => {self.file_format}, pattern => {sql_literal(pattern)})""")
+        return {row['FILE_NAME'].split('/')[-1]: row['CONTENT'] for row in rows}
+
+    def remember(self, checksum:str, release_items:dict, config_list:list, persist:bool = False) -> dict:
+        """
+        Keep parsed configs in this process and, when persist is set, in the cache table
+        """
+        loaded = {'checksum': checksum, 'release_items': release_items, 'config_list': config_list}
+        with _memory_lock:
+            _memory_cache[checksum] = loaded
+        if persist:
+            self.sql(f"""create table if not exists {self.cache_table} ( checksum varchar, release_items varchar, config_list varchar, loaded_at timestamp )""")
+            self.sql(f"""insert into {self.cache_table} select {sql_literal(checksum)}, {sql_literal(json.dumps(release_items))},
+                         {sql_literal(json.dumps(config_list))}, current_timestamp""")
+        return dict(loaded)
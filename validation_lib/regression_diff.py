@@ -0,0 +1,109 @@
+from regression_sql import quote_ident, where_clause
+
+
+# Classification of a row by the key based join diff
+DIFF_ADDED = 'ADDED'
+DIFF_REMOVED = 'REMOVED'
+DIFF_CHANGED = 'CHANGED'
+
+
+def parse_key_columns(config:dict) -> list:
+    """
+    Read the primary_key of a config block as a list of upper case column names.
+    Accepts a list or a comma separated string. Returns an empty list when no key is configured
+    """
+    key = config.get('primary_key') or []
+    if isinstance(key, str):
+        key = key.split(',')
+    return [col.strip().upper() for col in key if col and col.strip()]
+
+
+def join_diff_sql(model_name_ref:str, model_name_regression:str, key_column_list:list, column_list:list, condition:str = None) -> str:
+    """
+    Full outer join of both models on the key. Every row that is not identical on both sides is returned
+    with a DIFF_TYPE of ADDED (only in regression), REMOVED (only in reference) or CHANGED (compared columns differ).
+    Keys are joined and changed columns are compared with IS NOT DISTINCT FROM so that NULL = NULL.
+    The key has to be unique on both sides, see duplicate_keys_sql
+    """
+    value_list = [col for col in column_list if col not in key_column_list]
+    projection = ','.join(quote_ident(col) for col in key_column_list + value_list)
+    join_on = ' and '.join(f"""ref.{quote_ident(col)} is not distinct from regression.{quote_ident(col)}""" for col in key_column_list)
+    changed = ' and '.join(f"""ref.{quote_ident(col)} is not distinct from regression.{quote_ident(col)}""" for col in value_list) or 'true'
+    keys = ','.join(f"""coalesce(ref.{quote_ident(col)}, regression.{quote_ident(col)}) {quote_ident(col)}""" for col in key_column_list)
+    values = ''.join(f""", ref.{quote_ident(col)} {quote_ident(col + '_REF')}, regression.{quote_ident(col)} {quote_ident(col + '_REGRESSION')}""" for col in value_list)
+    return f"""with ref as (
+                    select {projection}, true in_ref from {model_name_ref}{where_clause(condition)}
+                    ),
+                    regression as (
+                    select {projection}, true in_regression from {model_name_regression}{where_clause(condition)}
+                    )
+                    select {keys},
+                    case when ref.in_ref is null then '{DIFF_ADDED}'
+                         when regression.in_regression is null then '{DIFF_REMOVED}'
+                         else '{DIFF_CHANGED}' end diff_type{values}
+                    from ref full outer join regression on {join_on}
+                    where ref.in_ref is null or regression.in_regression is null or not ({changed})"""
+
+
+def duplicate_keys_sql(model_name_ref:str, model_name_regression:str, key_column_list:list, condition:str = None) -> str:
+    """
+    Number of key values held by more than one row of either side. A NULL key counts as a value, as in the join
+    """
+    keys = ','.join(quote_ident(col) for col in key_column_list)
+    return f"""select count(*) from (
+                    select {keys} from {model_name_ref}{where_clause(condition)} group by {keys} having count(*) > 1
+                    union all
+                    select {keys} from {model_name_regression}{where_clause(condition)} group by {keys} having count(*) > 1
+                    )"""
+
+
+def diff_counts_sql(diff_sql:str, duplicate_sql:str = None) -> str:
+    """
+    Number of added, removed and changed rows of a join diff, computed in the warehouse.
+    With a duplicate_keys_sql query, DUPLICATE_KEYS holds the number of keys that are not unique, the counts are wrong then
+    """
+    duplicate_keys = f"""({duplicate_sql})""" if duplicate_sql else '0'
+    return f"""select
+                    count_if(diff_type = '{DIFF_ADDED}') rows_added,
+                    count_if(diff_type = '{DIFF_REMOVED}') rows_removed,
+                    count_if(diff_type = '{DIFF_CHANGED}') rows_changed,
+                    {duplicate_keys} duplicate_keys
+                    from ({diff_sql})"""
+
+
+def diff_rows_sql(diff_sql:str, key_column_list:list, limit:int) -> str:
+    """
+    The first differing rows of a join diff, ordered by key
+    """
+    order_by = ','.join(quote_ident(col) for col in key_column_list)
+    return f"""select * from ({diff_sql}) order by {order_by} limit {int(limit)}"""
+
+
+def spill_sql(stage_path:str, diff_sql:str, max_file_size:int) -> str:
+    """
+    Unload every differing row of a diff to a stage path as Parquet files of at most max_file_size bytes,
+    without passing through the client
+    """
+    return f"""copy into {stage_path} from ({diff_sql})
+                    file_format = (type = parquet) header = true overwrite = true max_file_size = {int(max_file_size)}"""
+
+
+def parse_column_groups(config:dict) -> int:
+    """
+    Number of compared columns per group of a config block with "column_groups", None when the model is compared at once
+    """
+    group_size = config.get('column_groups')
+    if not group_size:
+        return None
+    group_size = int(group_size)
+    if group_size < 1:
+        raise ValueError(f"""Invalid column_groups {config.get('column_groups')} for model {config.get('name')}""")
+    return group_size
+
+
+def column_groups(column_list:list, key_column_list:list, group_size:int) -> list:
+    """
+    Split the compared columns into groups of group_size columns, each group also carrying the key columns
+    """
+    value_list = [col for col in column_list if col not in key_column_list]
+    return [list(key_column_list) + value_list[start:start + group_size] for start in range(0, len(value_list), group_size)] or [list(key_column_list)]
@@ -0,0 +1,122 @@
+from regression_sql import quote_ident, where_clause
+from regression_diff import DIFF_ADDED, DIFF_REMOVED
+
+
+def parse_drilldown(config:dict) -> dict:
+    """
+    Read the drilldown block of a config block, e.g. {"buckets": 64, "max_depth": 3, "leaf_rows": 1000}.
+    Returns None when drill-down is not configured
+    """
+    drilldown = config.get('drilldown')
+    if not drilldown:
+        return None
+    if drilldown is True:
+        drilldown = {}
+    return {'buckets': max(int(drilldown.get('buckets', 64)), 2),
+            'max_depth': max(int(drilldown.get('max_depth', 3)), 1),
+            'leaf_rows': int(drilldown.get('leaf_rows', 1000))}
+
+
+def bucket_expr(hash_column_list:list, modulus:int) -> str:
+    """
+    Bucket of a row: hash of the bucketing columns modulo the number of buckets of the level
+    """
+    columns = ','.join(quote_ident(col) for col in hash_column_list)
+    return f"""mod(abs(hash({columns})), {int(modulus)})"""
+
+
+def bucket_condition(hash_column_list:list, modulus:int, bucket_list:list, condition:str = None) -> str:
+    """
+    Restrict rows to the given buckets, on top of an optional condition
+    """
+    in_buckets = bucket_expr(hash_column_list, modulus) + ' in (' + ','.join(str(int(bucket)) for bucket in bucket_list) + ')'
+    return '(' + condition + ') and ' + in_buckets if condition else in_buckets
+
+
+def bucket_hash_sql(model_name_ref:str, model_name_regression:str, hash_column_list:list, column_list:list, modulus:int, condition:str = None) -> str:
+    """
+    Per bucket row count and HASH_AGG of both sides. Only buckets that differ are returned
+    """
+    bucket = bucket_expr(hash_column_list, modulus)
+    columns = ','.join(quote_ident(col) for col in column_list)
+    return f"""with ref as (
+                    select {bucket} bucket, count(*) num_rows, hash_agg({columns}) fingerprint
+                    from {model_name_ref}{where_clause(condition)} group by 1
+                    ),
+                    regression as (
+                    select {bucket} bucket, count(*) num_rows, hash_agg({columns}) fingerprint
+                    from {model_name_regression}{where_clause(condition)} group by 1
+                    )
+                    select coalesce(ref.bucket, regression.bucket) bucket,
+                    coalesce(ref.num_rows, 0) ref_rows, coalesce(regression.num_rows, 0) regression_rows
+                    from ref full outer join regression on ref.bucket = regression.bucket
+                    where ref.fingerprint is distinct from regression.fingerprint
+                    or ref.num_rows is distinct from regression.num_rows
+                    order by 1"""
+
+
+def drilldown(run_query, model_name_ref:str, model_name_regression:str, hash_column_list:list, column_list:list,
+              buckets:int = 64, max_depth:int = 3, leaf_rows:int = 1000, condition:str = None, max_bucket_list:int = 1000,
+              hash_sql = bucket_hash_sql) -> tuple:
+    """
+    Locate differing rows by comparing per bucket hashes and subdividing only the mismatched buckets.
+    Level d splits rows into buckets**(d+1) buckets, so a bucket of level d holds the buckets of level d+1
+    with the same remainder. Drilling stops at max_depth, once every mismatched bucket holds at most
+    leaf_rows rows, or when the differences are spread over more than max_bucket_list buckets.
+    run_query executes a SQL statement and returns its rows, hash_sql builds the per bucket hash query (e.g. the one of the compare backend).
+    Returns (condition selecting the rows of the mismatched buckets or None when both sides are equal, list of level statistics)
+    """
+    levels = []
+    leaf_condition = condition
+    max_bucket_list = max(max_bucket_list, buckets)
+    for depth in range(max_depth):
+        modulus = buckets ** (depth + 1)
+        rows = run_query(hash_sql(model_name_ref, model_name_regression, hash_column_list, column_list, modulus, leaf_condition))
+        mismatched = [row['BUCKET'] for row in rows]
+        largest = max([max(row['REF_ROWS'], row['REGRESSION_ROWS']) for row in rows], default=0)
+        levels.append({'depth': depth, 'buckets': modulus, 'mismatched_buckets': len(mismatched), 'largest_bucket_rows': largest})
+        if not mismatched:
+            return (None, levels)
+        if len(mismatched) > max_bucket_list:
+            # Differences are everywhere, subdividing further does not narrow them down
+            break
+        leaf_condition = bucket_condition(hash_column_list, modulus, mismatched, condition)
+        if largest <= leaf_rows:
+            break
+    return (leaf_condition, levels)
+
+
+def set_diff_sql(model_name_ref:str, model_name_regression:str, column_list:list, condition:str = None) -> str:
+    """
+    Rows of a model without a key whose number of copies differs between both sides, compared as multisets of row hashes.
+    Every such row is returned once with a DIFF_TYPE of REMOVED (more copies in the reference) or ADDED (more copies
+    in the regression model) and the number of surplus copies in NUM_ROWS, so duplicate rows count
+    """
+    columns = ','.join(quote_ident(col) for col in column_list)
+    values = ','.join(f"""any_value({quote_ident(col)}) {quote_ident(col)}""" for col in column_list)
+    coalesced = ','.join(f"""coalesce(ref.{quote_ident(col)}, regression.{quote_ident(col)}) {quote_ident(col)}""" for col in column_list)
+    return f"""with ref as (
+                    select hash({columns}) row_hash, count(*) num_rows, {values}
+                    from {model_name_ref}{where_clause(condition)} group by 1
+                    ),
+                    regression as (
+                    select hash({columns}) row_hash, count(*) num_rows, {values}
+                    from {model_name_regression}{where_clause(condition)} group by 1
+                    )
+                    select {coalesced},
+                    case when coalesce(regression.num_rows, 0) > coalesce(ref.num_rows, 0) then '{DIFF_ADDED}' else '{DIFF_REMOVED}' end diff_type,
+                    abs(coalesce(regression.num_rows, 0) - coalesce(ref.num_rows, 0)) num_rows
+                    from ref full outer join regression on ref.row_hash = regression.row_hash
+                    where coalesce(ref.num_rows, 0) != coalesce(regression.num_rows, 0)"""
+
+
+def set_diff_counts_sql(diff_sql:str) -> str:
+    """
+    Number of added and removed rows of a set diff, counting every surplus copy of a row
+    """
+    return f"""select
+                    coalesce(sum(case when diff_type = '{DIFF_ADDED}' then num_rows end), 0) rows_added,
+                    coalesce(sum(case when diff_type = '{DIFF_REMOVED}' then num_rows end), 0) rows_removed,
+                    0 rows_changed,
+                    0 duplicate_keys
+                    from ({diff_sql})"""
@@ -0,0 +1,847 @@
+import pandas
+from regression_log import BufferedSink
+from regression_sql import EQUAL_RESULT, select_sql
+from regression_predicate import parse_predicate
+from regression_diff import parse_key_columns, join_diff_sql, duplicate_keys_sql, diff_counts_sql, diff_rows_sql, spill_sql, parse_column_groups, column_groups
+from regression_drilldown import parse_drilldown, drilldown, set_diff_sql, set_diff_counts_sql
+from regression_executor import run_parallel
+from regression_async import AsyncQueries
+from regression_profile import PROFILE_TABLE_COLUMNS, profile_table_ddl, profile_sql, parse_profile, profile_rows
+from regression_state import RunState, config_hash, model_key
+from regression_baseline import BaselineStore, side_fingerprint_sql, baseline_diff_sql, baseline_counts_sql
+from regression_sample import SAMPLE_LABEL, parse_sample, sample_fraction, sample_condition, sample_stats_sql, sample_report
+from regression_planner import STRATEGY_HASH, PLAN_COLUMNS, plan_table_ddl, plan_model, apply_plan, plan_row
+from regression_results import STATUS_FAIL, ResultCollector, results_table_ddl, diff_rows_json, result_status
+from regression_perf import PerfRecorder
+
+# Name of the regression stage in the stage results
+REGRESSION_STAGE = 'regression_execution'
+
+# Global buffered sink holding log information, set by regression_stage()
+log_sink = None
+# Global metadata cache shared by every model of the run, set by regression_stage()
+catalog = None
+# Compare backend running the reads, fingerprints and diffs (Snowpark or local DuckDB), set by regression_stage() or use_backend()
+backend = None
+# Perf recorder timing the stages of every model, set by regression_stage() or use_backend()
+perf = None
+# Identifier of the current run and buffered sink of the column profiles, set by regression_stage()
+run_id = None
+profile_sink = None
+# Buffered sink of the explain records of the planner, set by regression_stage()
+plan_sink = None
+# Results of every model of the run, written in bulk at the end of the run, set by regression_stage()
+result_collector = None
+# Number of differing rows fetched per model and the stage full diffs are spilled to, set by regression_stage()
+diff_options = {'limit': 10, 'spill_stage': 'validation_regression.diff_spill', 'spill_chunk_bytes': 16000000}
+# Global persistent state of the previous runs of every model, set by regression_stage()
+run_state = None
+# Global registry of the materialized reference baselines, set by regression_stage()
+baseline_store = None
+
+
+def log_message(session,function_name, message):
+    """
+    Appends a new log entry to the buffered log sink. Entries are written to the log table in bulk.
+    """
+    log_sink.log(function_name, message)
+
+
+
+def create_pandas_cmd(session,config:dict,exclude_column_list:list) :
+    """
+    Prepare the SQL that reads columns which are participating in the regression from both sides of a dbt model,
+    with the config filters pushed down as a predicate, and the columns the dataframes are sorted on.
+    Columns which have gone through a change in the MR, do not participate in the regression
+    """
+    log_message(session,'create_pandas_cmd',f"""Function Initiated""")
+    database, model, schema = config.get('database'), config.get('name'), config.get('schema')
+    try:
+        model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+        predicate = parse_predicate(config)
+        predicate.validate(model_col_list + list(exclude_column_list))
+        model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+        condition = model_condition(config, model_col_list)
+        pandas_cmd = {'ref_sql': select_sql(model_name_ref, model_col_list, condition),
+                      'regression_sql': select_sql(model_name_regression, model_col_list, condition),
+                      'sort_by': model_col_list,
+                      'diff_limit': diff_limit(config)}
+        log_message(session,'create_pandas_cmd',f""" pandas_cmd : {pandas_cmd}.""")
+
+    except Exception as e:
+        log_message(session,'create_pandas_cmd',f""" Error creating pandas cmd. {e}""")
+        return (database,model,schema,None)
+    
+    return (database,model,schema,pandas_cmd)
+    
+
+
+
+def get_model_columns(session,database:str, model:str, schema:str, exclude_col_list) -> list:
+    """
+    Read column names from a dbt model minus the list of columns that were changed.
+    Column names come from the run wide catalog cache, no table data is read
+    """
+    log_message(session,'get_model_columns',f"""Function Initiated""")
+    model_name_ref = database + '.' + schema + '.' + model
+    model_col_list = sorted (list( set(catalog.columns(database, schema, model)) - set(exclude_col_list)))
+    log_message(session,'get_model_columns',f""" Ref Model : {str(model_name_ref)}. Columns in attention : {model_col_list}.""")
+    return model_col_list
+
+
+
+def model_condition(config:dict, model_col_list:list) -> str:
+    """
+    The filter predicate of a model, restricted to a deterministic sample of the rows when the config block sets "sample".
+    Rows are sampled on a hash of the primary key, or of all compared columns when there is no key
+    """
+    condition = parse_predicate(config).to_sql()
+    sample = parse_sample(config)
+    if sample is None:
+        return condition
+    fraction = sample_fraction(sample, catalog.stats(config['database'], config['schema'], config['name'])['row_count'])
+    sampled = sample_condition(parse_key_columns(config) or model_col_list, fraction)
+    return f"""({condition}) and {sampled}""" if condition else sampled
+
+
+
+def check_supported(stage:str):
+    """
+    Fail a stage the compare backend cannot run (e.g. baselines on the local backend) with an explicit error
+    """
+    if stage in backend.unsupported:
+        raise NotImplementedError(f"""The {stage} stage is not supported on the {backend.name} backend""")
+
+
+
+def diff_limit(config:dict) -> int:
+    """
+    Number of differing rows fetched for a model: "diff_limit" of its config block or the run wide regression_diff_limit
+    """
+    return int(config.get('diff_limit') or diff_options['limit'])
+
+
+
+def create_fingerprint_cmd(session,config:dict,exclude_column_list:list) -> str:
+    """
+    Prepare the SQL that fingerprints the reference and regression model in the warehouse.
+    Fingerprinting is on unless the config block sets "fingerprint": false
+    """
+    log_message(session,'create_fingerprint_cmd',f"""Function Initiated""")
+    if config.get('fingerprint', True) in (False, 'false', 'False'):
+        log_message(session,'create_fingerprint_cmd',f"""Fingerprint disabled for model {config['name']}""")
+        return None
+    try:
+        model_name_ref, model_name_regression = backend.model_tables(config['database'], config['name'], config['schema'])
+        model_col_list = get_model_columns(session,config['database'], config['name'], config['schema'],exclude_column_list)
+        fingerprint_cmd = backend.fingerprint_sql(model_name_ref, model_name_regression, model_col_list, model_condition(config, model_col_list))
+        log_message(session,'create_fingerprint_cmd',f""" fingerprint_cmd : {fingerprint_cmd}.""")
+    except:
+        log_message(session,'create_fingerprint_cmd',f""" Error creating fingerprint cmd.""")
+        return None
+    return fingerprint_cmd
+
+
+
+def fingerprint_process(session,fingerprint_cmd:str,async_queries:AsyncQueries = None,model_result:dict = None) -> bool:
+    """
+    Compare row counts and aggregate hashes of both models without pulling any data.
+    Uses the already submitted fingerprint query when async queries are given.
+    The fingerprints are recorded in model_result when given.
+    Returns True when the fingerprints match
+    """
+    log_message(session,'fingerprint_process',f"""Function Initiated""")
+    with perf.span('fingerprint') as span:
+        try:
+            if async_queries is not None and 'fingerprint' in async_queries:
+                fingerprint = async_queries.result('fingerprint')[0]
+            else:
+                fingerprint = backend.query(fingerprint_cmd)[0]
+            span.fetched(rows = 1)
+            if model_result is not None:
+                model_result.update({name.lower(): fingerprint[name] for name in ('REF_ROWS', 'REF_FINGERPRINT', 'REGRESSION_ROWS', 'REGRESSION_FINGERPRINT')})
+            log_message(session,'fingerprint_process',f""" Ref rows : {fingerprint['REF_ROWS']}. Ref fingerprint : {fingerprint['REF_FINGERPRINT']}. Regression rows : {fingerprint['REGRESSION_ROWS']}. Regression fingerprint : {fingerprint['REGRESSION_FINGERPRINT']}.""")
+            return (fingerprint['REF_ROWS'] == fingerprint['REGRESSION_ROWS'] and
+                    fingerprint['REF_FINGERPRINT'] == fingerprint['REGRESSION_FINGERPRINT'])
+        except:
+            log_message(session,'fingerprint_process',f""" Error computing fingerprints""")
+            return False
+
+
+
+def create_key_diff_cmd(session,config:dict,exclude_column_list:list) -> tuple:
+    """
+    Prepare the SQL of the key based join diff for a model with a primary_key in its config block.
+    Returns (counts cmd, rows cmd) or None when no key is configured
+    """
+    log_message(session,'create_key_diff_cmd',f"""Function Initiated""")
+    key_column_list = parse_key_columns(config)
+    if not key_column_list:
+        log_message(session,'create_key_diff_cmd',f"""No primary key configured for model {config['name']}. Using the sort based compare""")
+        return None
+    if config.get('key_diff') is False:
+        log_message(session,'create_key_diff_cmd',f"""Key diff disabled for model {config['name']}. Using the sort based compare""")
+        return None
+    try:
+        model_name_ref, model_name_regression = backend.model_tables(config['database'], config['name'], config['schema'])
+        model_col_list = get_model_columns(session,config['database'], config['name'], config['schema'],exclude_column_list)
+        condition = model_condition(config, model_col_list)
+        diff_cmd = join_diff_sql(model_name_ref, model_name_regression, key_column_list, model_col_list, condition)
+        key_diff_cmd = (diff_counts_sql(diff_cmd, duplicate_keys_sql(model_name_ref, model_name_regression, key_column_list, condition)),
+                        diff_rows_sql(diff_cmd, key_column_list, diff_limit(config)))
+        log_message(session,'create_key_diff_cmd',f""" key_diff_cmd : {key_diff_cmd[1]}.""")
+    except:
+        log_message(session,'create_key_diff_cmd',f""" Error creating key diff cmd.""")
+        return None
+    return key_diff_cmd
+
+
+
+def key_diff_process(session,key_diff_cmd:tuple,async_queries:AsyncQueries = None,model_result:dict = None) -> str:
+    """
+    Join both models on the primary key in the warehouse, count added, removed and changed rows
+    and fetch only the first differing rows.
+    Uses the already submitted counts and rows queries when async queries are given.
+    The counts and the differing rows are recorded in model_result when given.
+    Returns None when the key is not unique on both sides, the join would multiply rows
+    """
+    log_message(session,'key_diff_process',f"""Function Initiated""")
+    with perf.span('key_diff') as span:
+        counts_cmd, rows_cmd = key_diff_cmd
+        if async_queries is not None and 'counts' in async_queries:
+            counts = async_queries.result('counts')[0]
+        else:
+            counts = backend.query(counts_cmd)[0]
+        if counts['DUPLICATE_KEYS']:
+            log_message(session,'key_diff_process',f""" The key is not unique : {counts['DUPLICATE_KEYS']} key values are held by several rows.""")
+            if async_queries is not None:
+                async_queries.cancel('rows')
+            return None
+        log_message(session,'key_diff_process',f""" Rows added : {counts['ROWS_ADDED']}. Rows removed : {counts['ROWS_REMOVED']}. Rows changed : {counts['ROWS_CHANGED']}.""")
+        if model_result is not None:
+            model_result.update({name.lower(): counts[name] for name in ('ROWS_ADDED', 'ROWS_REMOVED', 'ROWS_CHANGED')})
+        if counts['ROWS_ADDED'] + counts['ROWS_REMOVED'] + counts['ROWS_CHANGED'] == 0:
+            if async_queries is not None:
+                async_queries.cancel('rows')
+            return EQUAL_RESULT
+        if async_queries is not None and 'rows' in async_queries:
+            df_results = async_queries.result('rows', 'pandas')
+        else:
+            df_results = backend.query_pandas(rows_cmd)
+        span.fetched(df_results)
+        if model_result is not None:
+            model_result['diff_rows'] = diff_rows_json(df_results)
+        return (f"""Rows added : {counts['ROWS_ADDED']}. Rows removed : {counts['ROWS_REMOVED']}. Rows changed : {counts['ROWS_CHANGED']}.\n"""
+                + df_results.to_string())
+
+
+
+def create_drilldown_cmd(session,config:dict,exclude_column_list:list) -> dict:
+    """
+    Prepare the bucketed hash drill-down for a model with a drilldown block in its config.
+    Rows are bucketed on the primary key, or on all compared columns when there is no key.
+    Returns None when drill-down is not configured
+    """
+    log_message(session,'create_drilldown_cmd',f"""Function Initiated""")
+    try:
+        drilldown_cmd = parse_drilldown(config)
+        if drilldown_cmd is None:
+            return None
+        model_name_ref, model_name_regression = backend.model_tables(config['database'], config['name'], config['schema'])
+        model_col_list = get_model_columns(session,config['database'], config['name'], config['schema'],exclude_column_list)
+        key_column_list = parse_key_columns(config)
+        drilldown_cmd.update({'model_name_ref': model_name_ref, 'model_name_regression': model_name_regression,
+                              'column_list': model_col_list, 'key_column_list': key_column_list,
+                              'hash_column_list': key_column_list or model_col_list, 'condition': model_condition(config, model_col_list),
+                              'diff_limit': diff_limit(config)})
+        log_message(session,'create_drilldown_cmd',f""" drilldown_cmd : {drilldown_cmd}.""")
+    except:
+        log_message(session,'create_drilldown_cmd',f""" Error creating drilldown cmd.""")
+        return None
+    return drilldown_cmd
+
+
+
+def drilldown_process(session,drilldown_cmd:dict,model_result:dict = None) -> str:
+    """
+    Narrow the differences down to a few hash buckets and compare only the rows of those buckets
+    """
+    log_message(session,'drilldown_process',f"""Function Initiated""")
+    with perf.span('drilldown'):
+        leaf_condition, levels = drilldown(backend.query,
+                                           drilldown_cmd['model_name_ref'], drilldown_cmd['model_name_regression'],
+                                           drilldown_cmd['hash_column_list'], drilldown_cmd['column_list'],
+                                           drilldown_cmd['buckets'], drilldown_cmd['max_depth'], drilldown_cmd['leaf_rows'],
+                                           drilldown_cmd['condition'], hash_sql = backend.bucket_hash_sql)
+    for level in levels:
+        log_message(session,'drilldown_process',f""" Level {level['depth']} : {level['mismatched_buckets']} of {level['buckets']} buckets differ. Largest mismatched bucket : {level['largest_bucket_rows']} rows.""")
+    if leaf_condition is None:
+        return EQUAL_RESULT
+    regression_resultset = None
+    if drilldown_cmd['key_column_list']:
+        diff_cmd = join_diff_sql(drilldown_cmd['model_name_ref'], drilldown_cmd['model_name_regression'],
+                                 drilldown_cmd['key_column_list'], drilldown_cmd['column_list'], leaf_condition)
+        counts_cmd = diff_counts_sql(diff_cmd, duplicate_keys_sql(drilldown_cmd['model_name_ref'], drilldown_cmd['model_name_regression'],
+                                                                  drilldown_cmd['key_column_list'], leaf_condition))
+        regression_resultset = key_diff_process(session,(counts_cmd, diff_rows_sql(diff_cmd, drilldown_cmd['key_column_list'], drilldown_cmd['diff_limit'])),None,model_result)
+    if regression_resultset is None:
+        # Without a key, or with a key that is not unique, the rows of the mismatched buckets are compared as multisets
+        diff_cmd = set_diff_sql(drilldown_cmd['model_name_ref'], drilldown_cmd['model_name_regression'],
+                                drilldown_cmd['column_list'], leaf_condition)
+        regression_resultset = key_diff_process(session,(set_diff_counts_sql(diff_cmd), diff_rows_sql(diff_cmd, drilldown_cmd['column_list'], drilldown_cmd['diff_limit'])),None,model_result)
+    if regression_resultset == EQUAL_RESULT:
+        # The bucket hashes differ, so the model is never reported equal even when no differing row was isolated
+        levels_found = levels[-1]
+        regression_resultset = f"""Hash buckets differ : {levels_found['mismatched_buckets']} of {levels_found['buckets']} buckets, but no differing row was isolated."""
+    return regression_resultset
+
+
+
+def create_profile_cmd(session,config:dict,exclude_column_list:list) -> dict:
+    """
+    Prepare the column profile query of a model whose config block sets "profile": true
+    """
+    log_message(session,'create_profile_cmd',f"""Function Initiated""")
+    if config.get('profile') not in (True, 'true', 'True'):
+        return None
+    try:
+        database, model, schema = config['database'], config['name'], config['schema']
+        model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+        model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+        data_types = {col['COLUMN_NAME']: col['DATA_TYPE'] for col in catalog.column_types(database, schema, model)}
+        column_types = {col: data_types.get(col) for col in model_col_list}
+        profile_cmd = {'sql': profile_sql(model_name_ref, model_name_regression, column_types, model_condition(config, model_col_list)),
+                       'column_list': model_col_list}
+        log_message(session,'create_profile_cmd',f""" profile_cmd : {profile_cmd['sql']}.""")
+    except:
+        log_message(session,'create_profile_cmd',f""" Error creating profile cmd.""")
+        return None
+    return profile_cmd
+
+
+
+def profile_process(session,model:str,profile_cmd:dict) -> list:
+    """
+    Compare per column count, null count, min, max, sum, approximate distinct count and hash of both sides.
+    The profiles are stored in validation_regression.regression_column_profile.
+    Returns the columns whose profiles differ
+    """
+    log_message(session,'profile_process',f"""Function Initiated""")
+    check_supported('profile')
+    with perf.span('profile'):
+        profile = parse_profile(backend.query(profile_cmd['sql']), profile_cmd['column_list'])
+    for row in profile_rows(run_id, model.upper(), profile):
+        profile_sink.append(row)
+    differing_col_list = [col for col, values in profile.items() if not values['match']]
+    log_message(session,'profile_process',f""" {len(differing_col_list)} of {len(profile)} columns differ : {differing_col_list}.""")
+    return differing_col_list
+
+
+
+def baseline_process(session,config:dict,exclude_column_list:list,key:str,digest:str,model_result:dict = None) -> str:
+    """
+    Compare the regression model against the materialized baseline of the reference model of a config block
+    that sets "baseline": true. The baseline is built when the reference table changed since the last one,
+    otherwise the reference model is not read at all.
+    The fingerprints are recorded in model_result when given
+    """
+    log_message(session,'baseline_process',f"""Function Initiated""")
+    try:
+        check_supported('baseline')
+        database, model, schema = config['database'], config['name'], config['schema']
+        model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+        model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+        key_column_list = parse_key_columns(config)
+        condition = model_condition(config, model_col_list)
+        ref_stats = catalog.stats(database, schema, model)
+        with perf.span('baseline'):
+            entry = baseline_store.find(key, digest, ref_stats)
+            if entry is None:
+                entry = baseline_store.build(key, digest, ref_stats, model_name_ref, key_column_list, model_col_list, condition)
+                log_message(session,'baseline_process',f""" Baseline {entry['baseline_table']} built for model {key}.""")
+            else:
+                log_message(session,'baseline_process',f""" Reusing baseline {entry['baseline_table']} of model {key}.""")
+
+        fingerprint = backend.query(side_fingerprint_sql(model_name_regression, model_col_list, condition))[0]
+        if model_result is not None:
+            model_result.update({'ref_rows': entry['ref_num_rows'], 'ref_fingerprint': entry['ref_fingerprint'],
+                                 'regression_rows': fingerprint['NUM_ROWS'], 'regression_fingerprint': fingerprint['FINGERPRINT']})
+        log_message(session,'baseline_process',f""" Ref rows : {entry['ref_num_rows']}. Ref fingerprint : {entry['ref_fingerprint']}. Regression rows : {fingerprint['NUM_ROWS']}. Regression fingerprint : {fingerprint['FINGERPRINT']}.""")
+        if entry['ref_num_rows'] == fingerprint['NUM_ROWS'] and entry['ref_fingerprint'] == fingerprint['FINGERPRINT']:
+            return EQUAL_RESULT
+
+        diff_cmd = baseline_diff_sql(entry['baseline_table'], model_name_regression, key_column_list, model_col_list, condition)
+        regression_resultset = key_diff_process(session,(baseline_counts_sql(diff_cmd), diff_rows_sql(diff_cmd, key_column_list or ['ROW_HASH'], diff_limit(config))),None,model_result)
+        log_message(session,'baseline_process',f"""Lenth of the comparison resultset : {len(regression_resultset)}.""")
+    except Exception as e:
+        log_message(session,'baseline_process',f""" Error comparing against the baseline. {e}""")
+        return ('None')
+    return regression_resultset
+
+
+
+def sample_process(session,config:dict,exclude_column_list:list) -> str:
+    """
+    Size of the sample of a model whose config block sets "sample" and the estimated mismatch rate of the whole model,
+    with its 95% Wilson confidence interval. Returns the first line of the sampled result
+    """
+    log_message(session,'sample_process',f"""Function Initiated""")
+    database, model, schema = config['database'], config['name'], config['schema']
+    model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+    model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+    fraction = sample_fraction(parse_sample(config), catalog.stats(database, schema, model)['row_count'])
+    with perf.span('sample'):
+        stats = backend.query(sample_stats_sql(model_name_ref, model_name_regression, model_col_list, model_condition(config, model_col_list)))[0]
+    report = sample_report(fraction, stats)
+    log_message(session,'sample_process',report)
+    return report
+
+
+
+def spill_process(session,config:dict,exclude_column_list:list,model_result:dict = None) -> str:
+    """
+    Unload every differing row of a model whose config block sets "spill_diff": true to the spill stage, in chunks,
+    computed by a join diff on the key (or a diff of the row hash counts without a key) in the warehouse.
+    Returns the stage location, which is recorded in model_result when given
+    """
+    log_message(session,'spill_process',f"""Function Initiated""")
+    check_supported('spill')
+    database, model, schema = config['database'], config['name'], config['schema']
+    model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+    model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+    key_column_list = parse_key_columns(config)
+    condition = model_condition(config, model_col_list)
+    if key_column_list:
+        diff_cmd = join_diff_sql(model_name_ref, model_name_regression, key_column_list, model_col_list, condition)
+    else:
+        diff_cmd = set_diff_sql(model_name_ref, model_name_regression, model_col_list, condition)
+    location = f"""@{diff_options['spill_stage']}/{run_id}/{model.upper()}/"""
+    with perf.span('spill'):
+        backend.query(f"""create stage if not exists {diff_options['spill_stage']}""")
+        unloaded = backend.query(spill_sql(location, diff_cmd, diff_options['spill_chunk_bytes']))
+    log_message(session,'spill_process',f""" Diff of model {model.upper()} spilled to {location} : {unloaded[0][0] if unloaded else 0} rows.""")
+    if model_result is not None:
+        model_result['diff_location'] = location
+    return location
+
+
+
+def regression_process(session,database:str, model:str, schema:str, pandas_cmd:dict, fingerprint_cmd:str = None, key_diff_cmd:tuple = None, drilldown_cmd:dict = None, async_mode:bool = False, model_result:dict = None) -> str:
+    """
+    The regression process that compares two dataframes.
+    When a fingerprint cmd is given, the dataframes are only read if the fingerprints differ.
+    When a drilldown cmd is given, only the rows of mismatched hash buckets are compared.
+    When a key diff cmd is given, the comparison runs as a join in the warehouse instead of a sorted dataframe compare,
+    unless the key turns out not to be unique.
+    In async mode the fingerprint and the key diff queries are submitted together, and both dataframes are read at the same time.
+    The dataframes are always read through the backend, so the sorted compare stays where the backend runs it (the warehouse for Snowpark).
+    Measurements such as the fingerprints are recorded in model_result when given
+    """
+    log_message(session,'regression_process',f"""Function Initiated""")
+    try:
+        model_name_ref, model_name_regression = backend.model_tables(database, model, schema)
+        log_message(session,'regression_process',f""" Ref Model : {str(model_name_ref)}. Regression Model : {str(model_name_regression)}.""")
+        ref_stats, regression_stats = catalog.stats(database, schema, model), catalog.stats(database, schema + '_regression', model)
+        log_message(session,'regression_process',f""" Ref Model rows : {ref_stats['row_count']}, bytes : {ref_stats['bytes']}. Regression Model rows : {regression_stats['row_count']}, bytes : {regression_stats['bytes']}.""")
+        log_message(session,'regression_process',f""" pandas_cmd : {pandas_cmd}.""")
+
+        # Backends that cannot submit queries ahead compare one query after another
+        async_queries = backend.async_queries() if async_mode else None
+        if async_queries is not None:
+            if fingerprint_cmd:
+                async_queries.submit('fingerprint', fingerprint_cmd)
+            if key_diff_cmd and not drilldown_cmd:
+                async_queries.submit('counts', key_diff_cmd[0]).submit('rows', key_diff_cmd[1])
+            log_message(session,'regression_process',f"""Submitted queries : {list(async_queries.jobs)}.""")
+
+        if fingerprint_cmd and fingerprint_process(session,fingerprint_cmd,async_queries,model_result):
+            log_message(session,'regression_process',f"""Fingerprints match. Skipping the dataframe compare.""")
+            if async_queries is not None:
+                async_queries.cancel()
+            return EQUAL_RESULT
+
+        if drilldown_cmd:
+            regression_resultset = drilldown_process(session,drilldown_cmd,model_result)
+            log_message(session,'regression_process',f"""Lenth of the comparison resultset : {len(regression_resultset)}.""")
+            return regression_resultset
+
+        if key_diff_cmd:
+            regression_resultset = key_diff_process(session,key_diff_cmd,async_queries,model_result)
+            if regression_resultset is not None:
+                log_message(session,'regression_process',f"""Lenth of the comparison resultset : {len(regression_resultset)}.""")
+                return regression_resultset
+            log_message(session,'regression_process',f"""Falling back to the sorted compare.""")
+        
+        # Calculating the size of the ref model dataframe and the regression model dataframe
+
+        def read(task:tuple):
+            stage, sql_cmd = task
+            with perf.span(stage, model) as span:
+                df = backend.read(sql_cmd)
+                span.fetched(df)
+            return df
+        # In async mode both sides are read at the same time, the frames stay lazy where the backend reads them
+        reads = run_parallel([('read_ref', pandas_cmd['ref_sql']), ('read_regression', pandas_cmd['regression_sql'])], read, 2 if async_mode else 1)
+        for task, df, error in reads:
+            if error is not None:
+                raise error
+        df_ref, df_regression = reads[0][1], reads[1][1]
+
+        with perf.span('sort'):
+            df_ref_sorted = df_ref.sort_values(by=pandas_cmd['sort_by'])
+            df_ref_sorted.reset_index(drop=True,inplace=True)
+        
+            df_regression_sorted = df_regression.sort_values(by=pandas_cmd['sort_by'])
+            df_regression_sorted.reset_index(drop=True,inplace=True)
+        
+        log_message(session,'regression_process',f""" Ref Model Size : {str(df_ref_sorted.size)}. Regression Model Size: {str(df_regression_sorted.size)}.""")
+
+        #Dataframe compare works only if the sizes of the dataframe sizes are equal
+        if (df_ref_sorted.size == df_regression_sorted.size):
+            log_message(session,'regression_process',f"""The data frames are equal in size.""")
+            with perf.span('compare') as span:
+                df_results = df_ref_sorted.compare(df_regression_sorted)
+                df_results.reset_index(drop=True,inplace=True)
+                span.fetched(rows=len(df_results))
+            # The differing rows stay where the compare ran. Only their count and the first diff_limit rows are fetched
+            mismatch_count = len(df_results)
+            if model_result is not None:
+                model_result.update({'ref_rows': len(df_ref_sorted), 'regression_rows': len(df_regression_sorted), 'rows_changed': mismatch_count})
+            if mismatch_count:
+                df_head = df_results.head(pandas_cmd['diff_limit'])
+                if not isinstance(df_head, pandas.DataFrame):
+                    df_head = df_head.to_pandas()
+                regression_resultset = f"""Rows changed : {mismatch_count}.\n""" + df_head.to_string()
+                if model_result is not None:
+                    model_result['diff_rows'] = diff_rows_json(df_head)
+            else:
+                regression_resultset = EQUAL_RESULT
+            log_message(session,'regression_process',f"""Lenth of the comparison resultset : {len(regression_resultset)}.""")
+        else:
+            df_ref_sorted_num_rows = len(df_ref_sorted)
+            df_ref_sorted_num_cols = df_ref_sorted.shape[1]
+            df_regression_sorted_num_rows = len(df_regression_sorted)
+            df_regression_sorted_num_cols = df_regression_sorted.shape[1]
+            if model_result is not None:
+                model_result.update({'ref_rows': df_ref_sorted_num_rows, 'regression_rows': df_regression_sorted_num_rows})
+            regression_resultset = f"""The data frames are not equal in size. 
+                                    Size of the Ref dataset : {df_ref_sorted_num_rows}X{df_ref_sorted_num_cols} 
+                                    Size of the Regression dataset: {df_regression_sorted_num_rows} X {df_regression_sorted_num_cols} """
+            log_message(session,'regression_process',f"""Lenth of the comparison resultset : {len(regression_resultset)}.""")
+    except:
+        log_message(session,'regression_process',f""" Error processing regression""")
+        return ('None')
+    
+    return regression_resultset
+
+
+
+def column_group_process(session,config:dict,exclude_column_list:list,fingerprint_cmd:str = None,async_mode:bool = False,model_result:dict = None) -> str:
+    """
+    Compare a wide model whose config block sets "column_groups" group by group: every group holds that many compared
+    columns plus the key columns, so only one group of columns per worker is held in memory at a time.
+    Groups run on "column_group_parallelism" threads (1 by default). The group results are merged into one report.
+    Without a primary_key every group is sorted on its own columns, so rows are matched per group.
+    Models whose row counts differ are reported once, from the fingerprint or from the first group, without comparing the other groups
+    """
+    log_message(session,'column_group_process',f"""Function Initiated""")
+    database, model, schema = config['database'], config['name'], config['schema']
+    counts = {}
+    if fingerprint_cmd and fingerprint_process(session,fingerprint_cmd,None,counts):
+        log_message(session,'column_group_process',f"""Fingerprints match. Skipping the column groups.""")
+        if model_result is not None:
+            model_result.update(counts)
+        return EQUAL_RESULT
+    if model_result is not None:
+        model_result.update(counts)
+        # The fingerprint may already have run before the groups
+        counts = model_result
+    counted = counts.get('ref_rows') is not None and counts.get('regression_rows') is not None
+    if counted and counts['ref_rows'] != counts['regression_rows']:
+        log_message(session,'column_group_process',f"""Row counts differ. Skipping the column groups.""")
+        return f"""The data frames are not equal in size. Ref rows : {counts['ref_rows']}. Regression rows : {counts['regression_rows']}."""
+    model_col_list = get_model_columns(session,database, model, schema,exclude_column_list)
+    group_list = column_groups(model_col_list, parse_key_columns(config), parse_column_groups(config))
+    log_message(session,'column_group_process',f""" Comparing {len(model_col_list)} columns of model {model.upper()} in {len(group_list)} groups.""")
+
+    def compare_group(group:list) -> tuple:
+        group_result = {}
+        group_exclude_list = list(exclude_column_list) + [col for col in model_col_list if col not in group]
+        pandas_cmd = create_pandas_cmd(session,config,group_exclude_list)[3]
+        if pandas_cmd is None:
+            return ('None', group_result)
+        return (regression_process(session,database, model, schema, pandas_cmd, None, None, None, async_mode, group_result), group_result)
+
+    outcomes = []
+    if not counted:
+        # Without known row counts the first group runs alone, a row count mismatch then stops the compare
+        outcomes = run_parallel(group_list[:1], compare_group, 1)
+        first_resultset, first_result = outcomes[0][1] if outcomes[0][2] is None else ('None', {})
+        if first_result.get('ref_rows') != first_result.get('regression_rows'):
+            log_message(session,'column_group_process',f"""Row counts differ. Skipping the other column groups.""")
+            if model_result is not None:
+                model_result.update({name: first_result[name] for name in ('ref_rows', 'regression_rows')})
+            return first_resultset
+    outcomes += run_parallel(group_list[len(outcomes):], compare_group, config.get('column_group_parallelism') or 1)
+    report_list = []
+    for position, (group, outcome, error) in enumerate(outcomes):
+        group_resultset, group_result = outcome if error is None else ('None', {})
+        if group_resultset == 'None':
+            log_message(session,'column_group_process',f""" Error comparing column group {position + 1} : {error}""")
+            return ('None')
+        if model_result is not None:
+            for name in ('ref_rows', 'regression_rows'):
+                model_result.setdefault(name, group_result.get(name))
+            # Rows changed in one group may also be changed in another, the largest group count is a lower bound.
+            # It stays unknown unless a group measured it
+            if group_result.get('rows_changed') is not None:
+                model_result['rows_changed'] = max(model_result.get('rows_changed') or 0, group_result['rows_changed'])
+            if group_result.get('diff_rows') and not model_result.get('diff_rows'):
+                model_result['diff_rows'] = group_result['diff_rows']
+        log_message(session,'column_group_process',f""" Group {position + 1} of {len(group_list)} equal : {group_resultset == EQUAL_RESULT}.""")
+        if group_resultset != EQUAL_RESULT:
+            report_list.append(f"""Column group {position + 1} of {len(group_list)} ({', '.join(group)}) :\n{group_resultset}""")
+    if not report_list:
+        return EQUAL_RESULT
+    return '\n'.join(report_list)
+
+
+
+def compare_model(session,config_block:dict,exclude_column_list:list,fingerprint_cmd:str = None,async_mode:bool = False,model_result:dict = None) -> str:
+    """
+    Compare both sides of a model on the backend: fingerprint, then drill-down, key diff, column groups
+    or the sorted dataframe compare. Neither the run state nor the results table is touched
+    """
+    database, model, schema, pandas_cmd = create_pandas_cmd(session,config_block,exclude_column_list)
+    key_diff_cmd = create_key_diff_cmd(session,config_block,exclude_column_list)
+    drilldown_cmd = create_drilldown_cmd(session,config_block,exclude_column_list)
+    log_message(session,'main', f""" Full model name under process: {(database + '.' + schema + '.' + model)}""" )
+    if parse_column_groups(config_block) and not key_diff_cmd and not drilldown_cmd:
+        return column_group_process(session,config_block,exclude_column_list,fingerprint_cmd,async_mode,model_result)
+    return regression_process(session,database, model, schema, pandas_cmd, fingerprint_cmd, key_diff_cmd, drilldown_cmd, async_mode, model_result)
+
+
+
+def use_backend(compare_backend, sink, recorder:PerfRecorder = None):
+    """
+    Point the compare functions at a backend and a log sink outside of regression_stage(),
+    e.g. a LocalBackend over Parquet exports and a LogSink without a session for offline runs.
+    Without a perf recorder the spans are only kept in memory
+    """
+    global backend, catalog, log_sink, perf
+    backend, catalog, log_sink = compare_backend, compare_backend.catalog, sink
+    perf = recorder or PerfRecorder(compare_backend, None, None)
+
+
+
+def save_regression_result (session,database:str, model:str, schema:str, resultset:str, model_result:dict = None):
+    """
+    Collect the regression resultset of a model together with its counts and differing rows.
+    The results of all models are written to validation_regression.regression_results in one load at the end of the run
+    """
+    try:
+        log_message(session,'save_regression_result',f"""Function Initiated""")
+        log_message(session,'save_regression_result',f"""Final result for model {model} is {resultset}""")
+        with perf.span('save', model.upper()):
+            result_collector.add(run_id, database, schema, model, resultset, model_result)
+    except:
+        log_message(session,'save_regression_result',f""" Error saving regression result""")
+        return ('False')
+    return True
+
+
+
+def regression_model(session,config_block:dict,exclude_column_list:list,async_mode:bool = False,force_rerun:bool = False,plan:dict = None) -> str:
+    """
+    Runs the regression of a single model and saves its result.
+    The verdict of the previous run is reused when neither side nor the config changed since then,
+    unless a rerun is forced. The config covers the config block as planned, the strategy of the plan and the diff limit.
+    A reused verdict is saved with the diff counts and differing rows stored with it.
+    When a plan is given, the model is compared with the strategy of the plan
+    """
+    database, model, schema = config_block['database'], config_block['name'], config_block['schema']
+    # The baseline of the reference model only depends on the config block
+    key, baseline_digest = model_key(config_block), config_hash(config_block, exclude_column_list)
+    if plan is not None:
+        config_block = apply_plan(config_block, plan)
+    digest = config_hash(config_block, exclude_column_list, {'strategy': plan['strategy'] if plan is not None else None,
+                                                             'diff_limit': diff_options['limit']})
+    ref_stats, regression_stats = catalog.stats(database, schema, model), catalog.stats(database, schema + '_regression', model)
+    state = None if force_rerun or config_block.get('force_rerun') in (True, 'true', 'True') else run_state.lookup(key)
+    sampled = parse_sample(config_block) is not None
+    model_result = {'strategy': plan['strategy'] if plan is not None else None, 'sampled': sampled,
+                    'column_count': len(set(catalog.columns(database, schema, model)) - set(exclude_column_list))}
+
+    def finish(regression_resultset:str, fingerprint:dict = None) -> str:
+        if sampled and regression_resultset != 'None' and not regression_resultset.startswith(SAMPLE_LABEL):
+            try:
+                regression_resultset = sample_process(session,config_block,exclude_column_list) + '\n' + regression_resultset
+            except Exception as e:
+                log_message(session,'main',f"""Error estimating the mismatch rate of sampled model {model} : {e}""")
+                regression_resultset = SAMPLE_LABEL + 'mismatch rate unknown.\n' + regression_resultset
+        if len(regression_resultset) != 0:
+            save_regression_result(session,database, model, schema, regression_resultset, dict(fingerprint or {}, **model_result))
+        if regression_resultset != 'None':
+            run_state.record(key, digest, ref_stats, regression_stats, fingerprint or model_result, regression_resultset, run_id)
+        return regression_resultset
+
+    if RunState.metadata_unchanged(state, digest, ref_stats, regression_stats):
+        log_message(session,'main',f"""Model {key} unchanged since run {state['run_id']}. Reusing its verdict.""")
+        return finish(state['verdict'], state)
+
+    if config_block.get('baseline') in (True, 'true', 'True'):
+        # Compare against the stored reference baseline instead of reading the reference model
+        regression_resultset = baseline_process(session,config_block,exclude_column_list,key,baseline_digest,model_result)
+        if regression_resultset != EQUAL_RESULT and RunState.fingerprint_unchanged(state, digest, model_result):
+            log_message(session,'main',f"""Model {key} content unchanged since run {state['run_id']}. Reusing its verdict.""")
+            return finish(state['verdict'], state)
+        return finish(regression_resultset)
+
+    fingerprint_cmd = create_fingerprint_cmd(session,config_block,exclude_column_list)
+    if state is not None and fingerprint_cmd:
+        # The tables changed since the previous run, their content may not have
+        if fingerprint_process(session,fingerprint_cmd,None,model_result):
+            return finish(EQUAL_RESULT)
+        if RunState.fingerprint_unchanged(state, digest, model_result):
+            log_message(session,'main',f"""Model {key} content unchanged since run {state['run_id']}. Reusing its verdict.""")
+            return finish(state['verdict'], state)
+        fingerprint_cmd = None
+
+    if plan is not None and plan['strategy'] == STRATEGY_HASH:
+        # Fingerprints only, the model is too large for a row level diff
+        if 'ref_fingerprint' not in model_result:
+            hash_cmd = fingerprint_cmd or create_fingerprint_cmd(session,dict(config_block, fingerprint = True),exclude_column_list)
+            if hash_cmd and fingerprint_process(session,hash_cmd,None,model_result):
+                return finish(EQUAL_RESULT)
+        if 'ref_fingerprint' not in model_result:
+            return finish('None')
+        return finish(f"""Fingerprints differ (hash only plan, no row level diff). Ref rows : {model_result['ref_rows']}. Regression rows : {model_result['regression_rows']}.""")
+
+    profile_cmd = create_profile_cmd(session,config_block,exclude_column_list)
+    if profile_cmd:
+        # Profile the columns first and narrow the row level diff down to the columns whose profiles differ
+        if fingerprint_cmd and fingerprint_process(session,fingerprint_cmd,None,model_result):
+            log_message(session,'main',f"""Fingerprints match for model {model}. Skipping the profile.""")
+            return finish(EQUAL_RESULT)
+        fingerprint_cmd = None
+        try:
+            differing_col_list = profile_process(session,model,profile_cmd)
+        except Exception as e:
+            log_message(session,'main',f"""Error profiling model {model} : {e}""")
+            differing_col_list = []
+        # Without any differing column the difference lies in how values combine into rows, so every column is kept
+        if differing_col_list:
+            key_column_list = parse_key_columns(config_block)
+            exclude_column_list = list(exclude_column_list) + [col for col in profile_cmd['column_list']
+                                                               if col not in differing_col_list and col not in key_column_list]
+    regression_resultset = compare_model(session,config_block,exclude_column_list,fingerprint_cmd,async_mode,model_result)
+    if config_block.get('spill_diff') in (True, 'true', 'True') and result_status(regression_resultset) == STATUS_FAIL:
+        try:
+            spill_process(session,config_block,exclude_column_list,model_result)
+        except Exception as e:
+            log_message(session,'main',f"""Error spilling the diff of model {model} : {e}""")
+    return finish(regression_resultset)
+
+
+
+def plan_models(session, config_list:list, planner_limits:dict) -> dict:
+    """
+    Choose the compare strategy of every model from the catalog statistics.
+    Every plan is logged and stored as an explain record in validation_regression.regression_plan
+    """
+    log_message(session,'plan_models',f"""Function Initiated""")
+    plans = {}
+    for config_block in config_list:
+        database, model, schema = config_block['database'], config_block['name'], config_block['schema']
+        try:
+            plan = plan_model(config_block, catalog.stats(database, schema, model), catalog.stats(database, schema + '_regression', model),
+                              len(catalog.columns(database, schema, model)), planner_limits)
+        except Exception as e:
+            log_message(session,'plan_models',f""" Error planning model {model.upper()} : {e}. Using its config as is.""")
+            continue
+        plans[model.upper()] = plan
+        plan_sink.append(plan_row(run_id, plan))
+        log_message(session,'plan_models',f""" Model {model.upper()} : strategy {plan['strategy']}{' (override)' if plan['override'] else ''}. {plan['reason']}.""")
+    return plans
+
+
+
+def regression_stage(ctx):
+    """
+    Runs the regression for every model of the run context that no earlier stage skipped.
+    Models run concurrently on a pool of regression_parallelism threads, largest models first.
+    Models that did not change since the previous run reuse its verdict unless regression_force_rerun is set.
+    Unless regression_planner is false every model is compared with the strategy the planner chose for it.
+    Skipped models are recorded as failed with the reason they were skipped
+    """
+    global log_sink, catalog, backend, perf, run_id, profile_sink, plan_sink, result_collector, run_state, baseline_store, diff_options
+    session, options = ctx.session, ctx.options
+    log_sink, catalog, backend, perf, run_id = ctx.log_sink, ctx.catalog, ctx.backend, ctx.perf, ctx.run_id
+    log_message(session,'regression_stage',f"""Function Initiated""")
+    diff_options = {'limit': options.get('regression_diff_limit') or 10,
+                    'spill_stage': options.get('regression_spill_stage') or 'validation_regression.diff_spill',
+                    'spill_chunk_bytes': options.get('regression_spill_chunk_bytes') or 16000000}
+    session.sql(profile_table_ddl('validation_regression.regression_column_profile')).collect()
+    profile_sink = BufferedSink(session, 'validation_regression.regression_column_profile', PROFILE_TABLE_COLUMNS)
+    session.sql(plan_table_ddl('validation_regression.regression_plan')).collect()
+    plan_sink = BufferedSink(session, 'validation_regression.regression_plan', PLAN_COLUMNS)
+    session.sql(results_table_ddl('validation_regression.regression_results')).collect()
+    result_collector = ResultCollector(session, 'regression_results', 'validation_regression')
+    run_state = RunState(session, 'validation_regression.regression_run_state')
+    run_state.create()
+    run_state.load()
+    baseline_store = BaselineStore(session, 'validation_regression.regression_baseline_registry', query = backend.query)
+    baseline_store.create()
+    baseline_store.load()
+    parallelism = options.get('regression_parallelism') or 4
+    async_mode = bool(options.get('regression_async'))
+    force_rerun = bool(options.get('regression_force_rerun'))
+    planner_limits = None if options.get('regression_planner') is False else \
+                     {name: options.get('planner_' + name) for name in ('memory_rows', 'memory_cells', 'memory_bytes', 'huge_rows', 'sample_fraction')}
+    try:
+        for config_block in ctx.config_list:
+            reason = ctx.skipped.get(config_block['name'].upper())
+            if reason is not None:
+                regression_resultset = f"""Skipped : {reason}."""
+                save_regression_result(session,config_block['database'], config_block['name'], config_block['schema'], regression_resultset)
+                ctx.record(REGRESSION_STAGE, config_block['name'], result_status(regression_resultset), regression_resultset)
+
+        release_config_list = ctx.active_configs()
+        with perf.span('plan'):
+            plans = {} if planner_limits is None else plan_models(session, release_config_list, planner_limits)
+
+        def timed_model(config_block:dict) -> str:
+            # The queries of the model carry its query tag and its stages are timed under its name
+            with perf.model(config_block['name']):
+                return regression_model(session,config_block,ctx.release_items.get(config_block['name'].upper()),async_mode,force_rerun,plans.get(config_block['name'].upper()))
+
+        log_message(session,'regression_stage',f"""Running {len(release_config_list)} models with parallelism {parallelism} """)
+        outcomes = run_parallel(release_config_list,
+                                timed_model,
+                                parallelism,
+                                weight = lambda config_block: catalog.stats(config_block['database'], config_block['schema'], config_block['name'])['row_count'])
+        for config_block, regression_resultset, error in outcomes:
+            if error is not None:
+                log_message(session,'regression_stage',f"""Error processing model {config_block['name'].upper()} : {error} """)
+                regression_resultset = 'None'
+                save_regression_result(session,config_block['database'], config_block['name'], config_block['schema'], regression_resultset)
+            ctx.record(REGRESSION_STAGE, config_block['name'], result_status(regression_resultset), regression_resultset)
+        log_message(session,'regression_stage', f"""List of  models processed for regression : {[config_block['name'].upper() for config_block, _, _ in outcomes]}""")
+        with perf.span('write_results'):
+            written = result_collector.write()
+        log_message(session,'regression_stage',f"""{written} results written to validation_regression.regression_results for run {run_id}""")
+    finally:
+        try:
+            result_collector.write()
+        except Exception as e:
+            log_message(session,'regression_stage',f"""Error writing regression results : {e}""")
+        run_state.flush()
+        try:
+            baseline_store.touch()
+            evicted = baseline_store.evict(keep = options.get('baseline_keep') or 3,
+                                           ttl_days = options.get('baseline_ttl_days') or 30)
+            log_message(session,'regression_stage',f"""Evicted baselines : {evicted}""")
+        except Exception as e:
+            log_message(session,'regression_stage',f"""Error evicting baselines : {e}""")
+        profile_sink.close()
+        plan_sink.close()
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_parallel(task_list:list, worker, parallelism:int = 4, weight = None) -> list:
+    """
+    Run worker(task) for every task on a bounded pool of threads.
+    Tasks are submitted largest first when a weight function is given (e.g. the row count from the catalog),
+    so a big model does not start last and dominate the run time.
+    An exception raised for one task does not stop the others.
+    Returns a list of (task, result, error) in the order of task_list, whatever order the tasks finished in
+    """
+    order = list(range(len(task_list)))
+    if weight is not None:
+        order.sort(key=lambda position: (-(weight(task_list[position]) or 0), position))
+    outcomes = [None] * len(task_list)
+
+    def run(position):
+        try:
+            outcomes[position] = (task_list[position], worker(task_list[position]), None)
+        except Exception as e:
+            outcomes[position] = (task_list[position], None, e)
+
+    if parallelism is None or int(parallelism) <= 1:
+        for position in order:
+            run(position)
+    else:
+        with ThreadPoolExecutor(max_workers=int(parallelism)) as executor:
+            list(executor.map(run, order))
+    return outcomes
@@ -0,0 +1,127 @@
+import atexit
+import threading
+import time
+import pandas
+
+
+def sql_literal(value) -> str:
+    """
+    Render a python value as a Snowflake SQL literal
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, pandas.Timestamp):
+        return "'" + value.isoformat() + "'::timestamp_ntz"
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+
+class BufferedSink:
+    """
+    Append-only in-memory buffer of rows for a Snowflake table.
+    Rows are written with a single multi-row INSERT once the buffer reaches batch_size rows,
+    once flush_interval seconds have passed since the last flush, or when flush()/close() is called.
+    In synchronous mode every row is written straight away (useful while debugging).
+    Without a session (offline runs) the rows are only kept in memory.
+    """
+
+    # Keeps a single INSERT statement well below the Snowflake statement size limit
+    max_statement_bytes = 1000000
+
+    def __init__(self, session, table_name:str, columns:list, batch_size:int = 500, flush_interval:float = 30.0, synchronous:bool = False):
+        self.session = session
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self.rows = []
+        self.flushed_upto = 0
+        self.last_flush = time.monotonic()
+        # No flush is triggered by append() before this time, set after a failed write
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.closed = False
+        atexit.register(self.close)
+
+    def append(self, row:tuple):
+        """
+        Buffer a row and flush when a threshold is reached
+        """
+        with self.lock:
+            self.rows.append(tuple(row))
+            pending = len(self.rows) - self.flushed_upto
+            now = time.monotonic()
+            due = now >= self.retry_at and (self.synchronous or pending >= self.batch_size or
+                                            now - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending rows with as few INSERT statements as possible.
+        Progress is recorded after every statement, so a failed statement only leaves its own rows and the later ones pending
+        """
+        with self.lock:
+            pending = self.rows[self.flushed_upto:]
+            if not pending or self.session is None:
+                return
+            values = [ '(' + ','.join(sql_literal(value) for value in row) + ')' for row in pending ]
+            prefix = "Insert into " + self.table_name + " (" + ','.join(self.columns) + ") values "
+            statement, statement_bytes = [], len(prefix)
+            for value in values:
+                if statement and statement_bytes + len(value) > self.max_statement_bytes:
+                    self.session.sql(prefix + ','.join(statement)).collect()
+                    self.flushed_upto += len(statement)
+                    statement, statement_bytes = [], len(prefix)
+                statement.append(value)
+                statement_bytes += len(value) + 1
+            self.session.sql(prefix + ','.join(statement)).collect()
+            self.flushed_upto += len(statement)
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Final flush. Registered with atexit so a crashing model still persists what was buffered
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            atexit.unregister(self.close)
+
+
+
+class LogSink(BufferedSink):
+    """
+    Buffered writer for the validation_regression.*_log tables
+    """
+
+    def __init__(self, session, table_name:str, batch_size:int = 500, flush_interval:float = 30.0, synchronous:bool = False):
+        super().__init__(session, table_name, ['time', 'function_name', 'log_message'], batch_size, flush_interval, synchronous)
+
+    def log(self, function_name:str, message):
+        """
+        Buffer a log entry. A failed write never fails the caller: the error is logged as an entry of its own,
+        the unwritten entries stay buffered and the write is retried after flush_interval seconds
+        """
+        try:
+            self.append((pandas.Timestamp.now(), function_name, str(message)))
+        except Exception as e:
+            with self.lock:
+                self.retry_at = time.monotonic() + self.flush_interval
+                self.rows.append((pandas.Timestamp.now(), 'log_sink', f"""Error writing to {self.table_name} : {e}"""))
+
+    def to_pandas(self) -> pandas.DataFrame:
+        """
+        All log entries of the run as a DataFrame (timestamp, function, message)
+        """
+        with self.lock:
+            rows = list(self.rows)
+        return pandas.DataFrame(rows, columns=['timestamp', 'function', 'message'])
@@ -0,0 +1,144 @@
+import threading
+import time
+from contextlib import contextmanager
+import pandas
+from regression_log import BufferedSink
+
+
+# Columns of the validation_regression.regression_perf table, one row per span
+PERF_COLUMNS = ['run_id', 'model_name', 'stage', 'started_at', 'elapsed_seconds', 'rows_fetched', 'bytes_fetched', 'query_ids', 'query_tag']
+PERF_NUMBER_COLUMNS = ['elapsed_seconds', 'rows_fetched', 'bytes_fetched']
+# Stage of the span covering the whole regression of a model
+MODEL_SPAN = 'model'
+
+
+def perf_table_ddl(table_name:str) -> str:
+    """
+    DDL of the table holding the spans of every run, clustered by run
+    """
+    columns = ', '.join(f"""{col} {'number(38,6)' if col == 'elapsed_seconds' else 'number' if col in PERF_NUMBER_COLUMNS else 'timestamp_ntz' if col == 'started_at' else 'varchar'}"""
+                        for col in PERF_COLUMNS)
+    return f"""create table if not exists {table_name} ( {columns} ) cluster by (run_id)"""
+
+
+
+
+class Span:
+    """
+    Rows and bytes fetched within a span
+    """
+
+    def __init__(self):
+        self.rows = None
+        self.bytes = None
+
+    def fetched(self, df = None, rows:int = None, nbytes:int = None):
+        """
+        Add what a query brought back: a pandas DataFrame, or a number of rows and bytes.
+        Frames of other libraries (modin) are not measured, since measuring them would run another query
+        """
+        if isinstance(df, pandas.DataFrame):
+            rows, nbytes = len(df), int(df.memory_usage(index=False).sum())
+        if rows is not None:
+            self.rows = (self.rows or 0) + rows
+        if nbytes is not None:
+            self.bytes = (self.bytes or 0) + nbytes
+
+
+
+class PerfRecorder:
+    """
+    Timed spans of a run: elapsed time, rows and bytes fetched and the ids of the queries issued by the thread of the span.
+    The queries of a model carry the QUERY_TAG regression_test:<run_id>:<model>.
+    Spans are buffered and written to the perf table in bulk, without a session they are only kept in memory.
+    A failed write of the perf table never fails the stage of a span
+    """
+
+    def __init__(self, backend, table_name:str, run_id:str, session = None):
+        self.backend = backend
+        self.run_id = run_id
+        self.sink = BufferedSink(session, table_name, PERF_COLUMNS)
+        self.local = threading.local()
+        # Last error writing the perf table, the spans stay buffered meanwhile
+        self.write_error = None
+        self.history = None
+        if session is not None:
+            try:
+                # Records the query id and thread of every query of the session
+                self.history = session.query_history(include_thread_id=True)
+            except (AttributeError, TypeError):
+                self.history = None
+
+    def query_tag(self, model:str = None) -> str:
+        return f"""regression_test:{self.run_id}""" + (f""":{model.upper()}""" if model else '')
+
+    def query_ids(self, start:int) -> str:
+        if self.history is None:
+            return None
+        thread_id = threading.get_ident()
+        return ','.join(query.query_id for query in self.history.queries[start:] if getattr(query, 'thread_id', thread_id) == thread_id) or None
+
+    @contextmanager
+    def span(self, stage:str, model:str = None):
+        """
+        Time a stage. Defaults to the model of the current thread
+        """
+        model = model or getattr(self.local, 'model', None)
+        span = Span()
+        start = len(self.history.queries) if self.history is not None else 0
+        started_at, started = pandas.Timestamp.now(), time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.record((self.run_id, model, stage, started_at, round(time.perf_counter() - started, 6),
+                         span.rows, span.bytes, self.query_ids(start), self.query_tag(model)))
+
+    def record(self, row:tuple):
+        """
+        Buffer a span. When the write it triggers fails the error is kept in write_error,
+        the spans stay buffered and the write is retried after flush_interval seconds
+        """
+        try:
+            self.sink.append(row)
+        except Exception as e:
+            with self.sink.lock:
+                self.sink.retry_at = time.monotonic() + self.sink.flush_interval
+            self.write_error = e
+
+    @contextmanager
+    def model(self, model:str):
+        """
+        Span of the whole regression of a model. The queries of the thread carry the query tag of the model meanwhile
+        """
+        model = model.upper()
+        self.local.model = model
+        self.backend.set_query_tag(self.query_tag(model))
+        try:
+            with self.span(MODEL_SPAN, model) as span:
+                yield span
+        finally:
+            self.local.model = None
+            self.backend.set_query_tag(None)
+
+    def slowest_models(self, limit:int = 10) -> list:
+        """
+        The slowest models of the run, with the seconds spent in each stage, from the buffered spans
+        """
+        with self.sink.lock:
+            rows = [dict(zip(PERF_COLUMNS, row)) for row in self.sink.rows]
+        models = {}
+        for row in rows:
+            if row['model_name'] is None:
+                continue
+            entry = models.setdefault(row['model_name'], {'model_name': row['model_name'], 'elapsed_seconds': 0, 'stages': {}})
+            if row['stage'] == MODEL_SPAN:
+                entry['elapsed_seconds'] += row['elapsed_seconds']
+            else:
+                entry['stages'][row['stage']] = round(entry['stages'].get(row['stage'], 0) + row['elapsed_seconds'], 6)
+        return sorted(models.values(), key=lambda entry: entry['elapsed_seconds'], reverse=True)[:limit]
+
+    def close(self):
+        if self.history is not None:
+            self.history.__exit__(None, None, None)
+            self.history = None
+        self.sink.close()
@@ -0,0 +1,169 @@
+import uuid
+import pandas
+from regression_log import LogSink
+from regression_backend import SnowparkBackend
+from regression_perf import PerfRecorder, perf_table_ddl
+from regression_config import ConfigLoader
+
+
+# Columns of the rows stages record per model
+STAGE_COLUMNS = ['timestamp', 'model', 'stage', 'status', 'message']
+# Table the timed spans of every run are written to
+PERF_TABLE = 'validation_regression.regression_perf'
+
+
+
+class RunContext:
+    """
+    Everything the stages of a run share: the session, the log sink, the compare backend and its metadata catalog, the run id, the perf recorder,
+    the options read from the dbt model config and the config blocks of the release models.
+    setup() builds it once per run. A stage can skip a model, later stages then leave it out
+    """
+
+    def __init__(self, session, log_sink, options:dict = None, backend = None):
+        self.session = session
+        self.log_sink = log_sink
+        self.options = options or {}
+        self.backend = backend or SnowparkBackend(session)
+        self.catalog = self.backend.catalog
+        self.run_id = uuid.uuid4().hex
+        self.perf = PerfRecorder(self.backend, PERF_TABLE, self.run_id, session)
+        self.previous_query_tag = None
+        self.ready = False
+        self.release_items = {}
+        self.config_list = []
+        self.skipped = {}
+        self.stage_rows = []
+
+    def log(self, function_name:str, message:str):
+        self.log_sink.log(function_name, message)
+
+    def skip(self, model:str, reason:str):
+        """
+        Leave a model out of the later stages
+        """
+        self.skipped[model.upper()] = reason
+        self.log('pipeline', f"""Model {model.upper()} skipped by the later stages : {reason}""")
+
+    def active_configs(self) -> list:
+        """
+        Config blocks of the release models no stage skipped
+        """
+        return [config_block for config_block in self.config_list if config_block['name'].upper() not in self.skipped]
+
+    def record(self, stage:str, model:str, status:str, message:str):
+        """
+        Keep the outcome of a stage for a model
+        """
+        self.stage_rows.append((pandas.Timestamp.now(), model.upper(), stage, status, message))
+
+    def stage_results(self, stage:str = None) -> pandas.DataFrame:
+        return pandas.DataFrame([row for row in self.stage_rows if stage is None or row[2] == stage], columns=STAGE_COLUMNS)
+
+    def close(self):
+        """
+        Write the spans and the log. With the perf_summary option the slowest models are logged first
+        """
+        try:
+            for entry in self.perf.slowest_models(self.options.get('perf_summary') or 0):
+                self.log('perf_summary', f"""Model {entry['model_name']} : {entry['elapsed_seconds']:.3f}s. Seconds per stage : {entry['stages']}""")
+            try:
+                self.perf.close()
+            except Exception as e:
+                self.perf.write_error = e
+            if self.perf.write_error is not None:
+                self.log('pipeline', f"""Error writing to {PERF_TABLE} : {self.perf.write_error}""")
+            if self.session is not None:
+                self.session.query_tag = self.previous_query_tag
+        finally:
+            self.log_sink.close()
+
+
+
+def load_configs(ctx:RunContext) -> dict:
+    """
+    Release items and config blocks of the run, from the configs stage or from the local files of the
+    local_release_file and local_config_file options. Unchanged stage files are served from the config cache.
+    Returns None when the files are missing or not valid
+    """
+    ctx.log('load_configs',f"""Function Initiated""")
+    loader = ConfigLoader(ctx.session)
+    with ctx.perf.span('config_load') as span:
+        try:
+            if ctx.options.get('local_release_file') and ctx.options.get('local_config_file'):
+                loaded = loader.load_local(ctx.options['local_release_file'], ctx.options['local_config_file'])
+            else:
+                loaded = loader.load()
+        except Exception as e:
+            ctx.log('load_configs',f""" Error loading the release file and regression config : {e}""")
+            return None
+        span.fetched(rows = len(loaded['config_list']))
+    ctx.log('load_configs',f"""Release file : {loaded['release_file']}. Config file : {loaded['config_file']}. Checksum : {loaded['checksum']}""")
+    ctx.log('load_configs',f"""Configs loaded from {loaded['cached'] or 'the files'} in {loader.queries} queries""")
+    return loaded
+
+
+
+def setup(session, log_table:str, options:dict = None, backend = None) -> RunContext:
+    """
+    The setup every stage shares, done once per run: log table and sink, release notes,
+    regression config and the catalog of the release models.
+    The context is ready unless the configs could not be loaded or a release model has no config block.
+    Models are compared on the Snowpark backend unless another backend is given
+    """
+    options = options or {}
+    session.sql(f"""CREATE OR REPLACE TABLE {log_table} ( time timestamp, function_name varchar, log_message text ) """).collect()
+    log_sink = LogSink(session, log_table,
+                       batch_size = options.get('log_batch_size') or 500,
+                       synchronous = bool(options.get('log_synchronous')))
+    ctx = RunContext(session, log_sink, options, backend)
+    ctx.log('setup',f"""Function Initiated""")
+    # Timed spans of the run, and a query tag on every query of the run
+    session.sql(perf_table_ddl(PERF_TABLE)).collect()
+    ctx.previous_query_tag = session.query_tag
+    session.query_tag = ctx.perf.query_tag()
+
+    # Release notes and regression config, with one LIST and a cache keyed by the file checksums
+    loaded = load_configs(ctx)
+    if loaded is None:
+        return ctx
+    ctx.release_items = loaded['release_items']
+    release_models_list = set(ctx.release_items)
+    ctx.log('setup',f"""Release models from the release notes : {release_models_list} """)
+    config_items_list = loaded['config_list']
+    config_models_list = [config_block['name'].upper() for config_block in config_items_list]
+    ctx.log('setup',f"""Config models list: {config_models_list} """)
+
+    if not release_models_list.issubset(config_models_list):
+        ctx.log('setup', "List of models in the release note is not a subset of regression config")
+        return ctx
+
+    for index, config_block in enumerate(config_items_list):
+        if config_block['name'].upper() in release_models_list:
+            ctx.log('setup',f"""Iteration: {index}. Queuing {config_block['name'].upper()} """)
+            ctx.config_list.append(config_block)
+        else:
+            ctx.log('setup',f"""Skipping model : {config_block['name'].upper()} """)
+
+    # Resolve columns and table statistics of every release model with one metadata query
+    with ctx.perf.span('column_resolution'):
+        ctx.catalog.load_models(ctx.config_list)
+    ctx.log('setup',f"""Catalog loaded with {len(ctx.catalog.tables)} tables in {ctx.catalog.queries} queries""")
+    ctx.ready = True
+    return ctx
+
+
+
+def run_stages(ctx:RunContext, stage_list:list):
+    """
+    Run the stages, a list of (name, function of the context), one after another over the run context.
+    Nothing runs when the setup did not complete
+    """
+    if not ctx.ready:
+        ctx.log('pipeline',f"""Setup did not complete. No stage runs""")
+        return
+    for name, stage in stage_list:
+        ctx.log('pipeline',f"""Stage {name} started on {len(ctx.active_configs())} models""")
+        with ctx.perf.span(name):
+            stage(ctx)
+        ctx.log('pipeline',f"""Stage {name} finished. Skipped models : {ctx.skipped}""")
@@ -0,0 +1,102 @@
+from regression_diff import parse_key_columns, parse_column_groups
+from regression_sample import parse_sample
+
+
+# Compare strategies, from the cheapest to read to the most detailed
+STRATEGY_HASH = 'hash'           # fingerprints only, no row level diff
+STRATEGY_SAMPLE = 'sample'       # row level diff of a deterministic sample
+STRATEGY_DRILLDOWN = 'drilldown' # bucketed hash drill-down, diff of the mismatched buckets only
+STRATEGY_JOIN = 'join'           # warehouse side join diff on the primary key
+STRATEGY_MEMORY = 'memory'       # both sides read, sorted and compared in the runner (models without a key)
+STRATEGIES = [STRATEGY_HASH, STRATEGY_SAMPLE, STRATEGY_DRILLDOWN, STRATEGY_JOIN, STRATEGY_MEMORY]
+
+# Default limits of the planner, overridable with the planner_* model configs
+PLANNER_DEFAULTS = {'memory_rows': 1000000, 'memory_cells': 50000000, 'memory_bytes': 1000000000,
+                    'huge_rows': 500000000, 'sample_fraction': 0.01}
+
+# Columns of the validation_regression.regression_plan table, one explain record per model and run
+PLAN_COLUMNS = ['run_id', 'model_name', 'strategy', 'reason', 'override', 'keyed',
+                'ref_rows', 'regression_rows', 'max_bytes', 'column_count']
+
+
+def plan_table_ddl(table_name:str) -> str:
+    """
+    DDL of the table holding the plan of every model
+    """
+    columns = ', '.join(f"""{col} {'boolean' if col in ('override', 'keyed') else 'number' if col.endswith('_rows') or col in ('max_bytes', 'column_count') else 'varchar'}"""
+                        for col in PLAN_COLUMNS)
+    return f"""create table if not exists {table_name} ( {columns} )"""
+
+
+def plan_model(config:dict, ref_stats:dict, regression_stats:dict, column_count:int, limits:dict = None) -> dict:
+    """
+    Choose the compare strategy of a model from its catalog statistics.
+    A "strategy" in the config block wins. A config block with a drilldown block or a sample keeps it.
+    Otherwise keyed models are compared with a join diff, small models without a key in memory, large models
+    without a key with a drill-down, and huge models on a sample (keyed) or on their fingerprints only.
+    A positional compare of a keyed model would report every row after an added or removed key as changed
+    """
+    limits = dict(PLANNER_DEFAULTS, **{name: value for name, value in (limits or {}).items() if value is not None})
+    keyed = bool(parse_key_columns(config))
+    row_list = [stats['row_count'] for stats in (ref_stats, regression_stats) if stats['row_count'] is not None]
+    byte_list = [stats['bytes'] for stats in (ref_stats, regression_stats) if stats['bytes'] is not None]
+    rows, size = max(row_list, default=0), max(byte_list, default=0)
+    # A model compared in column groups only holds one group of columns in memory at a time
+    group_size = parse_column_groups(config)
+    width = min(column_count, group_size + len(parse_key_columns(config))) if group_size else column_count
+    plan = {'model_name': config['name'].upper(), 'override': False, 'keyed': keyed,
+            'ref_rows': ref_stats['row_count'], 'regression_rows': regression_stats['row_count'],
+            'max_bytes': size, 'column_count': column_count}
+
+    strategy = str(config.get('strategy') or '').lower()
+    if strategy:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"""Unknown strategy {config.get('strategy')} for model {config['name']}. Supported strategies : {STRATEGIES}""")
+        if strategy == STRATEGY_JOIN and not keyed:
+            raise ValueError(f"""Strategy {strategy} of model {config['name']} needs a primary_key""")
+        plan.update({'strategy': strategy, 'reason': 'strategy set in the config block', 'override': True})
+    elif config.get('drilldown'):
+        plan.update({'strategy': STRATEGY_DRILLDOWN, 'reason': 'drilldown block set in the config block'})
+    elif parse_sample(config) is not None:
+        plan.update({'strategy': STRATEGY_SAMPLE, 'reason': 'sample set in the config block'})
+    elif not row_list:
+        plan.update({'strategy': STRATEGY_JOIN if keyed else STRATEGY_MEMORY, 'reason': 'no catalog statistics'})
+    elif keyed and rows <= limits['huge_rows']:
+        plan.update({'strategy': STRATEGY_JOIN, 'reason': f"""{rows} rows, join diff on the key"""})
+    elif rows <= limits['memory_rows'] and rows * width <= limits['memory_cells'] and (group_size or size <= limits['memory_bytes']):
+        plan.update({'strategy': STRATEGY_MEMORY, 'reason': f"""{rows} rows x {width} columns{' per group' if group_size else ''}, {size} bytes fit in memory"""})
+    elif rows <= limits['huge_rows']:
+        plan.update({'strategy': STRATEGY_DRILLDOWN, 'reason': f"""{rows} rows exceed the in-memory limits, no key for a join diff"""})
+    else:
+        plan.update({'strategy': STRATEGY_SAMPLE if keyed else STRATEGY_HASH,
+                     'reason': f"""{rows} rows exceed {limits['huge_rows']}, {'sampled on the key' if keyed else 'no key to sample on, fingerprints only'}"""})
+    if plan['strategy'] == STRATEGY_SAMPLE and not config.get('sample'):
+        plan['sample'] = limits['sample_fraction']
+    return plan
+
+
+def apply_plan(config:dict, plan:dict) -> dict:
+    """
+    Copy of a config block whose options select the compare path of the plan.
+    A keyed model keeps its join diff under the memory strategy, so rows are aligned on the key rather than on their position
+    """
+    config = dict(config)
+    strategy = plan['strategy']
+    if strategy == STRATEGY_MEMORY:
+        config['drilldown'] = {}
+        if not parse_key_columns(config):
+            config['key_diff'] = False
+    elif strategy == STRATEGY_JOIN:
+        config['drilldown'] = {}
+    elif strategy == STRATEGY_DRILLDOWN:
+        config['drilldown'] = config.get('drilldown') or True
+    elif strategy == STRATEGY_SAMPLE:
+        config['sample'] = config.get('sample') or plan.get('sample')
+    return config
+
+
+def plan_row(run_id:str, plan:dict) -> tuple:
+    """
+    Row of the regression_plan table for a plan
+    """
+    return tuple(run_id if col == 'run_id' else plan.get(col) for col in PLAN_COLUMNS)
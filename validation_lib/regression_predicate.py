@@ -0,0 +1,114 @@
+from regression_log import sql_literal
+from regression_sql import quote_ident
+
+
+# Comparison operators accepted in regression_config.json and their SQL counterparts
+COMPARISON_OPERATORS = {"==": "=", "=": "=", "!=": "!=", "<>": "!=", ">": ">", ">=": ">=", "<": "<", "<=": "<="}
+LIST_OPERATORS = {"in": "in", "not in": "not in"}
+NULL_OPERATORS = {"is null": "is null", "is not null": "is not null"}
+RANGE_OPERATORS = {"between": "between", "not between": "not between"}
+RELATIVE_OPERATORS = {"last_n_days": "day", "last_n_hours": "hour"}
+
+# Casts applied to filter values when the filter declares a type
+VALUE_TYPES = {"string": "varchar", "number": "number", "float": "float", "date": "date", "timestamp": "timestamp_ntz", "boolean": "boolean"}
+
+
+class Condition:
+    """
+    A single validated filter condition: column, operator, value and optional value type
+    """
+
+    def __init__(self, column:str, operator:str, value = None, value_type:str = None):
+        if not column or not str(column).strip():
+            raise ValueError("Filter column is missing")
+        self.column = str(column).strip().upper()
+        self.operator = " ".join(str(operator).strip().lower().split())
+        self.value_type = value_type.lower() if value_type else None
+        if self.value_type is not None and self.value_type not in VALUE_TYPES:
+            raise ValueError(f"""Unsupported filter type {value_type} for column {self.column}""")
+        if self.operator in COMPARISON_OPERATORS:
+            if value is None or isinstance(value, (list, dict)):
+                raise ValueError(f"""Operator {operator} on column {self.column} needs a single value""")
+        elif self.operator in LIST_OPERATORS:
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"""Operator {operator} on column {self.column} needs a non empty list of values""")
+        elif self.operator in RANGE_OPERATORS:
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(f"""Operator {operator} on column {self.column} needs a list of two values""")
+        elif self.operator in RELATIVE_OPERATORS:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) and not str(value).isdigit():
+                raise ValueError(f"""Operator {operator} on column {self.column} needs a number""")
+            value = int(value)
+        elif self.operator not in NULL_OPERATORS:
+            raise ValueError(f"""Unsupported filter operator {operator} on column {self.column}""")
+        self.value = value
+
+    def literal(self, value) -> str:
+        """
+        Render a filter value as a SQL literal, cast to the declared type
+        """
+        if self.value_type is None:
+            return sql_literal(value)
+        return sql_literal(value) + '::' + VALUE_TYPES[self.value_type]
+
+    def to_sql(self) -> str:
+        """
+        SQL text of the condition
+        """
+        column = quote_ident(self.column)
+        if self.operator in COMPARISON_OPERATORS:
+            return column + ' ' + COMPARISON_OPERATORS[self.operator] + ' ' + self.literal(self.value)
+        if self.operator in LIST_OPERATORS:
+            return column + ' ' + LIST_OPERATORS[self.operator] + ' (' + ','.join(self.literal(value) for value in self.value) + ')'
+        if self.operator in RANGE_OPERATORS:
+            return column + ' ' + RANGE_OPERATORS[self.operator] + ' ' + self.literal(self.value[0]) + ' and ' + self.literal(self.value[1])
+        if self.operator in RELATIVE_OPERATORS:
+            unit = RELATIVE_OPERATORS[self.operator]
+            start = 'current_date' if unit == 'day' else 'current_timestamp'
+            return column + f""" >= dateadd({unit}, -{self.value}, {start})"""
+        return column + ' ' + NULL_OPERATORS[self.operator]
+
+
+
+class Predicate:
+    """
+    Conjunction of filter conditions pushed into the SQL that reads each side of a model
+    """
+
+    def __init__(self, conditions:list = None):
+        self.conditions = list(conditions or [])
+
+    @property
+    def columns(self) -> list:
+        return sorted({condition.column for condition in self.conditions})
+
+    def validate(self, column_list:list):
+        """
+        Raise a ValueError when a condition references a column the model does not have
+        """
+        missing = [col for col in self.columns if col not in set(col.upper() for col in column_list)]
+        if missing:
+            raise ValueError(f"""Filter columns {missing} do not exist in the model""")
+
+    def to_sql(self) -> str:
+        """
+        SQL text of the predicate, None when there are no conditions
+        """
+        if not self.conditions:
+            return None
+        return ' and '.join('(' + condition.to_sql() + ')' for condition in self.conditions)
+
+
+
+def parse_predicate(config:dict) -> Predicate:
+    """
+    Compile the filters of a config block into a Predicate.
+    Reads the "filters" list, e.g. [{"column": "SALE_DATE", "operator": "between", "value": ["2025-01-01", "2025-01-07"], "type": "date"}],
+    together with the single filter_column / filter_operator / filter_column_value filter
+    """
+    conditions = []
+    if config.get("filter_column") and config.get("filter_operator") and config.get("filter_column_value"):
+        conditions.append(Condition(config["filter_column"], config["filter_operator"], str(config["filter_column_value"])))
+    for condition in config.get("filters") or []:
+        conditions.append(Condition(condition.get("column"), condition.get("operator"), condition.get("value"), condition.get("type")))
+    return Predicate(conditions)
@@ -0,0 +1,81 @@
+from regression_sql import quote_ident, where_clause
+
+
+# Aggregates computed per column on both sides
+PROFILE_MEASURES = ['count', 'nulls', 'min', 'max', 'sum', 'distinct', 'hash']
+
+# Data types that support SUM, and data types MIN and MAX are not computed on
+NUMERIC_TYPES = {'NUMBER', 'DECIMAL', 'NUMERIC', 'INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'TINYINT', 'BYTEINT', 'FLOAT', 'FLOAT4', 'FLOAT8', 'DOUBLE', 'DOUBLE PRECISION', 'REAL'}
+UNORDERED_TYPES = {'VARIANT', 'OBJECT', 'ARRAY', 'MAP', 'GEOGRAPHY', 'GEOMETRY', 'VECTOR'}
+
+# Columns of the validation_regression.regression_column_profile table
+PROFILE_TABLE_COLUMNS = ['run_id', 'model_name', 'column_name', 'profile_match'] + \
+                        ['ref_' + measure for measure in PROFILE_MEASURES] + ['regression_' + measure for measure in PROFILE_MEASURES]
+
+
+def profile_table_ddl(table_name:str) -> str:
+    """
+    DDL of the table holding column profiles
+    """
+    measures = ', '.join(f"""{side}_{measure} {'number' if measure in ('count', 'nulls', 'distinct', 'hash') else 'varchar'}"""
+                         for side in ('ref', 'regression') for measure in PROFILE_MEASURES)
+    return f"""create table if not exists {table_name} ( run_id varchar, model_name varchar, column_name varchar, profile_match boolean, {measures} )"""
+
+
+def profile_expressions(column:str, data_type:str) -> list:
+    """
+    The aggregate expressions of one column, in PROFILE_MEASURES order
+    """
+    col = quote_ident(column)
+    data_type = (data_type or '').upper()
+    ordered = data_type not in UNORDERED_TYPES
+    return [f"""count({col})""",
+            f"""count_if({col} is null)""",
+            f"""min({col})::varchar""" if ordered else "null::varchar",
+            f"""max({col})::varchar""" if ordered else "null::varchar",
+            f"""sum({col})::varchar""" if data_type in NUMERIC_TYPES else "null::varchar",
+            f"""approx_count_distinct({col})""",
+            f"""hash_agg({col})"""]
+
+
+def profile_sql(model_name_ref:str, model_name_regression:str, column_types:dict, condition:str = None) -> str:
+    """
+    Profile of every column of both sides with one scan per table.
+    column_types maps column names to data types. Returns one row per side (SIDE = REF or REGRESSION)
+    with a C<n>_<MEASURE> column for measure of the n-th column
+    """
+    expressions = []
+    for position, (column, data_type) in enumerate(column_types.items()):
+        for measure, expression in zip(PROFILE_MEASURES, profile_expressions(column, data_type)):
+            expressions.append(f"""{expression} c{position}_{measure}""")
+    projection = ',\n                    '.join(expressions)
+    return f"""select 'REF' side,
+                    {projection}
+                    from {model_name_ref}{where_clause(condition)}
+                    union all
+                    select 'REGRESSION' side,
+                    {projection}
+                    from {model_name_regression}{where_clause(condition)}"""
+
+
+def parse_profile(rows:list, column_list:list) -> dict:
+    """
+    Turn the rows of profile_sql into {column: {'ref': {...}, 'regression': {...}, 'match': bool}}
+    """
+    sides = {str(row['SIDE']).lower(): row for row in rows}
+    profile = {}
+    for position, column in enumerate(column_list):
+        profile[column] = {side: {measure: sides[side][f"""C{position}_{measure.upper()}"""] for measure in PROFILE_MEASURES}
+                           for side in ('ref', 'regression')}
+        profile[column]['match'] = profile[column]['ref'] == profile[column]['regression']
+    return profile
+
+
+def profile_rows(run_id:str, model:str, profile:dict) -> list:
+    """
+    Rows of the regression_column_profile table for a model profile
+    """
+    return [tuple([run_id, model, column, values['match']] +
+                  [values['ref'][measure] for measure in PROFILE_MEASURES] +
+                  [values['regression'][measure] for measure in PROFILE_MEASURES])
+            for column, values in profile.items()]
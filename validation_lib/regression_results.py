@@ -0,0 +1,138 @@
+import threading
+import pandas
+from regression_sql import EQUAL_RESULT
+from regression_sample import SAMPLE_LABEL
+
+
+# Status of a model in the results table
+STATUS_PASS = 'PASS'
+STATUS_FAIL = 'FAIL'
+STATUS_ERROR = 'ERROR'
+
+# Columns of the validation_regression.regression_results table, one row per model and run
+RESULT_COLUMNS = ['RUN_ID', 'MODEL_NAME', 'DATABASE_NAME', 'SCHEMA_NAME', 'STATUS', 'STRATEGY', 'SAMPLED',
+                  'REF_ROWS', 'REGRESSION_ROWS', 'COLUMN_COUNT', 'ROWS_ADDED', 'ROWS_REMOVED', 'ROWS_CHANGED',
+                  'RESULT', 'DIFF_ROWS', 'DIFF_LOCATION', 'CREATED_AT']
+RESULT_NUMBER_COLUMNS = ['REF_ROWS', 'REGRESSION_ROWS', 'COLUMN_COUNT', 'ROWS_ADDED', 'ROWS_REMOVED', 'ROWS_CHANGED']
+# Columns holding JSON documents, stored as VARIANT so they are queried without parse_json
+RESULT_VARIANT_COLUMNS = ['DIFF_ROWS']
+
+
+def results_table_ddl(table_name:str) -> str:
+    """
+    DDL of the results table, clustered by run so a run is read without scanning the others
+    """
+    columns = ', '.join(f"""{col} {'number' if col in RESULT_NUMBER_COLUMNS else 'variant' if col in RESULT_VARIANT_COLUMNS else 'boolean' if col == 'SAMPLED' else 'timestamp_ntz' if col == 'CREATED_AT' else 'varchar'}"""
+                        for col in RESULT_COLUMNS)
+    return f"""create table if not exists {table_name} ( {columns} ) cluster by (run_id)"""
+
+
+def results_load_sql(table_name:str, load_table_name:str) -> str:
+    """
+    Append the rows of a load table to the results table, parsing the JSON columns into VARIANT
+    """
+    columns = ', '.join(RESULT_COLUMNS)
+    values = ', '.join(f"""parse_json({col})""" if col in RESULT_VARIANT_COLUMNS else col for col in RESULT_COLUMNS)
+    return f"""insert into {table_name} ( {columns} ) select {values} from {load_table_name}"""
+
+
+def result_status(resultset:str) -> str:
+    """
+    PASS, FAIL or ERROR from the text result of a model. The first line of a sampled result is ignored
+    """
+    if resultset is None or resultset == 'None':
+        return STATUS_ERROR
+    if resultset.startswith(SAMPLE_LABEL):
+        resultset = resultset.split('\n', 1)[-1]
+    if resultset == EQUAL_RESULT:
+        return STATUS_PASS
+    return STATUS_FAIL
+
+
+def diff_rows_json(df_results) -> str:
+    """
+    The differing rows of a compare as a JSON array of objects.
+    The (column, self/other) header of a pandas compare is flattened into column_self / column_other
+    """
+    df_results = df_results.copy()
+    if isinstance(df_results.columns, pandas.MultiIndex):
+        df_results.columns = ['_'.join(str(level) for level in col) for col in df_results.columns]
+    return df_results.to_json(orient='records', date_format='iso', default_handler=str)
+
+
+
+class ResultCollector:
+    """
+    Results of every model of a run, kept in memory and written with one bulk load at the end of the run
+    """
+
+    def __init__(self, session, table_name:str, schema:str):
+        self.session = session
+        self.table_name = table_name
+        self.schema = schema
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def add(self, run_id:str, database:str, schema:str, model:str, resultset:str, model_result:dict = None):
+        model_result = model_result or {}
+        row = {'RUN_ID': run_id, 'MODEL_NAME': model.upper(), 'DATABASE_NAME': database.upper(), 'SCHEMA_NAME': schema.upper(),
+               'STATUS': result_status(resultset), 'STRATEGY': model_result.get('strategy'), 'SAMPLED': bool(model_result.get('sampled')),
+               'RESULT': resultset, 'DIFF_ROWS': model_result.get('diff_rows'), 'DIFF_LOCATION': model_result.get('diff_location'),
+               'CREATED_AT': pandas.Timestamp.utcnow().tz_localize(None)}
+        row.update({col: model_result.get(col.lower()) for col in RESULT_NUMBER_COLUMNS})
+        with self.lock:
+            self.rows.append(row)
+
+    def to_pandas(self) -> pandas.DataFrame:
+        with self.lock:
+            df = pandas.DataFrame(self.rows, columns=RESULT_COLUMNS)
+        for col in RESULT_NUMBER_COLUMNS:
+            df[col] = pandas.to_numeric(df[col], errors='coerce').astype('Int64')
+        return df
+
+    def write(self) -> int:
+        """
+        Load the collected results with a single write_pandas call into a temporary load table,
+        appended to the results table with one insert that parses the differing rows into VARIANT.
+        Returns the number of rows written
+        """
+        df = self.to_pandas()
+        if df.empty:
+            return 0
+        load_table_name = (self.table_name + '_load').upper()
+        self.session.write_pandas(df, load_table_name, schema=self.schema.upper(), auto_create_table=True, overwrite=True,
+                                  table_type='temporary', use_logical_type=True)
+        self.session.sql(results_load_sql(f"""{self.schema}.{self.table_name}""".upper(), f"""{self.schema}.{load_table_name}""".upper())).collect()
+        with self.lock:
+            self.rows = self.rows[len(df):]
+        return len(df)
+
+
+def latest_run_sql(table_name:str) -> str:
+    """
+    Results of the latest run
+    """
+    return f"""select * from {table_name} qualify run_id = first_value(run_id) over (order by created_at desc)"""
+
+
+def model_verdict_sql(table_name:str) -> str:
+    """
+    Verdict of every model of the latest run, in one set based query
+    """
+    return f"""select run_id, model_name, database_name, schema_name, status, strategy, sampled,
+                    rows_added, rows_removed, rows_changed, created_at
+                    from ({latest_run_sql(table_name)})"""
+
+
+def outcome_sql(table_name:str) -> str:
+    """
+    Overall verdict of the latest run with the number of passed, failed and errored models.
+    RESULT is TRUE only when at least one model ran and every model passed
+    """
+    return f"""select case when count(*) > 0 and count_if(status != '{STATUS_PASS}') = 0 then 'TRUE' else 'FALSE' end result,
+                    any_value(run_id) run_id,
+                    count_if(status = '{STATUS_PASS}') passed,
+                    count_if(status = '{STATUS_FAIL}') failed,
+                    count_if(status = '{STATUS_ERROR}') errored,
+                    count_if(sampled) sampled
+                    from ({latest_run_sql(table_name)})"""
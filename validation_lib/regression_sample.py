@@ -0,0 +1,91 @@
+import math
+from regression_sql import quote_ident, where_clause
+
+
+# Prefix of the first line of every sampled result
+SAMPLE_LABEL = "Sampled : "
+
+# Rows are spread over this many hash slots, a sample keeps the slots below fraction * SAMPLE_SLOTS
+SAMPLE_SLOTS = 1000000
+
+
+def parse_sample(config:dict) -> dict:
+    """
+    Read the optional "sample" of a config block. A value up to 1 is a fraction of the rows ({'fraction': f}),
+    1 being the whole model, and a whole number above 1 is a number of rows ({'rows': n}).
+    Returns None when the model is not sampled
+    """
+    value = config.get('sample')
+    if value in (None, '', False):
+        return None
+    value = float(value)
+    if value <= 0 or (value > 1 and not value.is_integer()):
+        raise ValueError(f"""Invalid sample {config.get('sample')} for model {config.get('name')} : a fraction up to 1 or a whole number of rows""")
+    if value == 1:
+        return None
+    if value < 1:
+        return {'fraction': value}
+    return {'rows': int(value)}
+
+
+def sample_fraction(sample:dict, row_count) -> float:
+    """
+    Fraction of the rows to keep. A number of rows is turned into a fraction of the reference row count
+    """
+    if 'fraction' in sample:
+        return sample['fraction']
+    if not row_count:
+        return 1.0
+    return min(1.0, sample['rows'] / row_count)
+
+
+def sample_condition(hash_column_list:list, fraction:float) -> str:
+    """
+    Deterministic sample of the rows: the same hash slots, hence the same keys, are kept on both sides
+    """
+    columns = ','.join(quote_ident(col) for col in hash_column_list)
+    return f"""mod(abs(hash({columns})), {SAMPLE_SLOTS}) < {max(1, int(round(fraction * SAMPLE_SLOTS)))}"""
+
+
+def sample_stats_sql(model_name_ref:str, model_name_regression:str, column_list:list, condition:str = None) -> str:
+    """
+    Sample size of both sides and the number of sampled rows only found on one side,
+    compared as multisets of row hashes
+    """
+    row_hash = 'hash(' + ','.join(quote_ident(col) for col in column_list) + ')'
+    return f"""with ref as (
+                    select {row_hash} row_hash, count(*) num_rows from {model_name_ref}{where_clause(condition)} group by 1
+                    ),
+                    regression as (
+                    select {row_hash} row_hash, count(*) num_rows from {model_name_regression}{where_clause(condition)} group by 1
+                    )
+                    select coalesce(sum(ref.num_rows), 0) ref_rows, coalesce(sum(regression.num_rows), 0) regression_rows,
+                    coalesce(sum(greatest(coalesce(regression.num_rows, 0) - coalesce(ref.num_rows, 0), 0)), 0) rows_added,
+                    coalesce(sum(greatest(coalesce(ref.num_rows, 0) - coalesce(regression.num_rows, 0), 0)), 0) rows_removed
+                    from ref full outer join regression on ref.row_hash = regression.row_hash"""
+
+
+def wilson_interval(mismatches:int, sample_size:int, z:float = 1.96) -> tuple:
+    """
+    Wilson score interval of a mismatch rate, 95% for the default z
+    """
+    if not sample_size:
+        return (0.0, 1.0)
+    rate = mismatches / sample_size
+    denominator = 1 + z * z / sample_size
+    centre = (rate + z * z / (2 * sample_size)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / sample_size + z * z / (4 * sample_size * sample_size)) / denominator
+    return (max(0.0, centre - margin), min(1.0, centre + margin))
+
+
+def sample_report(fraction:float, stats:dict) -> str:
+    """
+    First line of a sampled result: sample size, estimated mismatch rate and its 95% bounds.
+    A changed row counts once even though it is both removed and added
+    """
+    sample_size = max(stats['REF_ROWS'], stats['REGRESSION_ROWS'])
+    mismatches = min(sample_size, max(stats['ROWS_ADDED'], stats['ROWS_REMOVED']))
+    rate = mismatches / sample_size if sample_size else 0.0
+    low, high = wilson_interval(mismatches, sample_size)
+    return (f"""{SAMPLE_LABEL}{fraction:.4%} of rows. Sample size : {sample_size}. Mismatched rows : {mismatches}. """
+            f"""Estimated mismatch rate : {rate:.4%} (95% confidence interval {low:.4%} - {high:.4%}).""")
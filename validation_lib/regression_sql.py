@@ -0,0 +1,51 @@
+# Result string recorded for a model whose reference and regression data are identical
+EQUAL_RESULT = "The data frames are equal"
+
+
+def quote_ident(name:str) -> str:
+    """
+    Quote a column or table identifier
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def model_tables(database:str, model:str, schema:str) -> tuple:
+    """
+    Fully qualified names of the reference model and its regression copy
+    """
+    model_name_ref = database + '.' + schema + '.' + model
+    model_name_regression = database + '.' + schema + '_regression.' + model
+    return (model_name_ref, model_name_regression)
+
+
+def where_clause(condition:str) -> str:
+    """
+    Render an optional condition as a WHERE clause
+    """
+    return " where " + condition if condition else ""
+
+
+def select_sql(model_name:str, column_list:list, condition:str = None) -> str:
+    """
+    Projection of the compared columns of a model with the filter predicate pushed down
+    """
+    return "select " + ','.join(quote_ident(col) for col in column_list) + " from " + model_name + where_clause(condition)
+
+
+def fingerprint_sql(model_name_ref:str, model_name_regression:str, column_list:list, condition:str = None) -> str:
+    """
+    Single statement returning the row count and the order independent HASH_AGG of the
+    compared columns for both sides. Nothing but two numbers per side leaves the warehouse
+    """
+    columns = ','.join(quote_ident(col) for col in column_list)
+    return f"""with ref as (
+                    select count(*) num_rows, hash_agg({columns}) fingerprint
+                    from {model_name_ref}{where_clause(condition)}
+                    ),
+                    regression as (
+                    select count(*) num_rows, hash_agg({columns}) fingerprint
+                    from {model_name_regression}{where_clause(condition)}
+                    )
+                    select ref.num_rows ref_rows, ref.fingerprint ref_fingerprint,
+                    regression.num_rows regression_rows, regression.fingerprint regression_fingerprint
+                    from ref cross join regression"""
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+from regression_log import sql_literal
+
+
+# Columns of the validation_regression.regression_run_state table, one row per model
+STATE_COLUMNS = ['model_name', 'config_hash',
+                 'ref_last_altered', 'ref_rows', 'ref_fingerprint',
+                 'regression_last_altered', 'regression_rows', 'regression_fingerprint',
+                 'verdict', 'run_id',
+                 'rows_added', 'rows_removed', 'rows_changed', 'diff_rows', 'diff_location']
+STATE_NUMBER_COLUMNS = ['ref_rows', 'ref_fingerprint', 'regression_rows', 'regression_fingerprint', 'rows_added', 'rows_removed', 'rows_changed']
+# Measures of the verdict, replayed into the results of a run that reuses it
+VERDICT_COLUMNS = ['rows_added', 'rows_removed', 'rows_changed', 'diff_rows', 'diff_location']
+
+
+def config_hash(config:dict, exclude_column_list:list, run_options:dict = None) -> str:
+    """
+    Checksum of everything besides the data that decides the outcome of a model: its config block, the excluded columns
+    and the run options that change its verdict, such as the strategy of its plan and the diff limit
+    """
+    payload = json.dumps({'config': config, 'exclude': sorted(exclude_column_list or []), 'options': run_options or {}},
+                         sort_keys=True, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def model_key(config:dict) -> str:
+    return (config['database'] + '.' + config['schema'] + '.' + config['name']).upper()
+
+
+
+class RunState:
+    """
+    Persistent state of the previous run of every model: LAST_ALTERED, row count and fingerprint of both sides
+    together with the verdict, its diff counts and differing rows. A model whose state did not change can reuse the stored verdict.
+    All states are read with one query and written back with one MERGE per run
+    """
+
+    def __init__(self, session, table_name:str):
+        self.session = session
+        self.table_name = table_name
+        self.states = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def create(self):
+        columns = ', '.join(f"""{col} {'number' if col in STATE_NUMBER_COLUMNS else 'varchar'}""" for col in STATE_COLUMNS)
+        self.session.sql(f"""create table if not exists {self.table_name} ( {columns}, updated_at timestamp )""").collect()
+        # Tables created before the verdict measures were kept
+        verdict_columns = ', '.join(f"""{col} {'number' if col in STATE_NUMBER_COLUMNS else 'varchar'}""" for col in VERDICT_COLUMNS)
+        self.session.sql(f"""alter table {self.table_name} add column if not exists {verdict_columns}""").collect()
+
+    def load(self):
+        """
+        Read the stored state of every model
+        """
+        rows = self.session.sql(f"""select {','.join(STATE_COLUMNS)} from {self.table_name}""").collect()
+        self.states = {row['MODEL_NAME']: {col: row[col.upper()] for col in STATE_COLUMNS} for row in rows}
+        return self
+
+    def lookup(self, key:str) -> dict:
+        return self.states.get(key)
+
+    @staticmethod
+    def metadata_unchanged(state:dict, digest:str, ref_stats:dict, regression_stats:dict) -> bool:
+        """
+        True when config, LAST_ALTERED and row count of both sides are the same as in the stored state
+        """
+        if not state or state['config_hash'] != digest or state['verdict'] is None:
+            return False
+        if ref_stats['last_altered'] is None or regression_stats['last_altered'] is None:
+            return False
+        return (state['ref_last_altered'] == str(ref_stats['last_altered']) and state['ref_rows'] == ref_stats['row_count'] and
+                state['regression_last_altered'] == str(regression_stats['last_altered']) and state['regression_rows'] == regression_stats['row_count'])
+
+    @staticmethod
+    def fingerprint_unchanged(state:dict, digest:str, fingerprint:dict) -> bool:
+        """
+        True when config and the fingerprints of both sides are the same as in the stored state.
+        Catches tables that were rebuilt with identical content
+        """
+        if not state or not fingerprint or state['config_hash'] != digest or state['verdict'] is None:
+            return False
+        return all(state[col] is not None and state[col] == fingerprint.get(col)
+                   for col in ('ref_fingerprint', 'regression_fingerprint'))
+
+    def record(self, key:str, digest:str, ref_stats:dict, regression_stats:dict, fingerprint:dict, verdict:str, run_id:str):
+        """
+        Buffer the new state of a model. fingerprint holds the measures of the verdict: the fingerprints,
+        and the diff counts and differing rows when the model was diffed
+        """
+        fingerprint = fingerprint or {}
+        state = {'model_name': key, 'config_hash': digest,
+                 'ref_last_altered': None if ref_stats['last_altered'] is None else str(ref_stats['last_altered']),
+                 'ref_rows': ref_stats['row_count'],
+                 'ref_fingerprint': fingerprint.get('ref_fingerprint'),
+                 'regression_last_altered': None if regression_stats['last_altered'] is None else str(regression_stats['last_altered']),
+                 'regression_rows': regression_stats['row_count'],
+                 'regression_fingerprint': fingerprint.get('regression_fingerprint'),
+                 'verdict': verdict, 'run_id': run_id}
+        state.update({col: fingerprint.get(col) for col in VERDICT_COLUMNS})
+        with self.lock:
+            self.pending[key] = state
+
+    def flush(self):
+        """
+        Write every buffered state with a single MERGE
+        """
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending = {}
+        if not pending:
+            return
+        values = ','.join('(' + ','.join(sql_literal(state[col]) for col in STATE_COLUMNS) + ')' for state in pending)
+        source = ', '.join(f"""column{position + 1} {col}""" for position, col in enumerate(STATE_COLUMNS))
+        updates = ', '.join(f"""t.{col} = s.{col}""" for col in STATE_COLUMNS[1:])
+        self.session.sql(f"""merge into {self.table_name} t
+                            using (select {source} from values {values}) s
+                            on t.model_name = s.model_name
+                            when matched then update set {updates}, t.updated_at = current_timestamp
+                            when not matched then insert ({','.join(STATE_COLUMNS)}, updated_at)
+                            values ({','.join('s.' + col for col in STATE_COLUMNS)}, current_timestamp)""").collect()
+        for state in pending:
+            self.states[state['model_name']] = state
@@ -0,0 +1,54 @@
+from regression_log import sql_literal
+
+
+# Column level outcome of the data type validation
+COLUMN_MATCH = 'Match'
+COLUMN_MISMATCH = 'Mismatch'
+COLUMN_ADDED = 'Added'
+COLUMN_DROPPED = 'Dropped'
+
+
+def type_validation_sql(database:str, model_list:list) -> str:
+    """
+    Set based data type validation of many models in one statement.
+    model_list holds (schema, model) pairs of the reference side, the regression side lives in <schema>_REGRESSION.
+    The column metadata of both sides is fully outer joined, so columns that only exist on one side are reported
+    as Added (regression only) or Dropped (reference only). Every column of every model gets a DATA_TYPE_MATCH of Pass or Fail
+    """
+    models = ','.join('(' + sql_literal(schema.upper()) + ',' + sql_literal(model.upper()) + ')' for schema, model in model_list)
+    return f"""with models as (
+                    select column1 table_schema, column2 table_name from values {models}
+                    ),
+                    df_ref as (
+                    select m.table_schema, m.table_name, c.column_name, c.data_type,
+                    c.character_maximum_length, c.numeric_precision, c.numeric_precision_radix
+                    from {database}.information_schema.columns c
+                    join models m on c.table_schema = m.table_schema and c.table_name = m.table_name
+                    ),
+                    df_current as (
+                    select m.table_schema, m.table_name, c.column_name, c.data_type,
+                    c.character_maximum_length, c.numeric_precision, c.numeric_precision_radix
+                    from {database}.information_schema.columns c
+                    join models m on c.table_schema = m.table_schema || '_REGRESSION' and c.table_name = m.table_name
+                    )
+                    select
+                    coalesce(df_ref.table_schema, df_current.table_schema) table_schema,
+                    coalesce(df_ref.table_name, df_current.table_name) table_name,
+                    coalesce(df_ref.column_name, df_current.column_name) column_name,
+                    df_ref.data_type data_type_ref, df_current.data_type,
+                    df_ref.character_maximum_length character_maximum_length_ref, df_current.character_maximum_length,
+                    df_ref.numeric_precision numeric_precision_ref, df_current.numeric_precision,
+                    df_ref.numeric_precision_radix numeric_precision_radix_ref, df_current.numeric_precision_radix,
+                    case when df_current.column_name is null then '{COLUMN_DROPPED}'
+                         when df_ref.column_name is null then '{COLUMN_ADDED}'
+                         when (nvl(df_ref.data_type,'') = nvl(df_current.data_type,'')) and
+                              (nvl(df_ref.character_maximum_length,0) = nvl(df_current.character_maximum_length,0)) and
+                              (nvl(df_ref.numeric_precision,0) = nvl(df_current.numeric_precision,0)) and
+                              (nvl(df_ref.numeric_precision_radix,0) = nvl(df_current.numeric_precision_radix,0))
+                         then '{COLUMN_MATCH}' else '{COLUMN_MISMATCH}' end column_status,
+                    iff(column_status = '{COLUMN_MATCH}', 'Pass', 'Fail') data_type_match
+                    from df_ref full outer join df_current
+                    on df_ref.table_schema = df_current.table_schema
+                    and df_ref.table_name = df_current.table_name
+                    and df_ref.column_name = df_current.column_name
+                    order by 1, 2, 3"""
@@ -0,0 +1,110 @@
+import pandas
+from typing import Tuple
+from regression_types import type_validation_sql
+from regression_async import AsyncQueries
+
+
+# Name of the data type validation stage in the stage results
+TYPE_VALIDATION_STAGE = 'data_type_validation'
+
+
+def data_type_validation_process(ctx, config:dict) -> Tuple[str, pandas.DataFrame]:
+    """
+    Data type validation of one model from the column metadata in the catalog
+    """
+    ctx.log('data_type_validation_process',f"""Function Initiated""")
+    try:
+        if config["name"] and config["database"] and config["schema"]:
+                database = config['database'].upper()
+                model = config['name'].upper()
+                schema = config['schema'].upper()
+
+        # Column metadata of both sides comes from the catalog cache
+        type_columns = ['COLUMN_NAME', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH', 'NUMERIC_PRECISION', 'NUMERIC_PRECISION_RADIX']
+        df_ref = pandas.DataFrame(ctx.catalog.column_types(database, schema, model), columns=type_columns)
+        df_current = pandas.DataFrame(ctx.catalog.column_types(database, schema + '_REGRESSION', model), columns=type_columns)
+        df_results = df_ref.merge(df_current, on='COLUMN_NAME', how='left', suffixes=('_REF', ''))
+        data_type_match = pandas.Series(True, index=df_results.index)
+        for col, empty in [('DATA_TYPE', ''), ('CHARACTER_MAXIMUM_LENGTH', 0), ('NUMERIC_PRECISION', 0), ('NUMERIC_PRECISION_RADIX', 0)]:
+            data_type_match &= df_results[col + '_REF'].fillna(empty) == df_results[col].fillna(empty)
+        df_results['DATA_TYPE_MATCH'] = data_type_match.map({True: 'Pass', False: 'Fail'})
+        data_type_match_list = (df_results['DATA_TYPE_MATCH'].unique()).tolist()
+        if 'Fail' in data_type_match_list :
+            status = 'Fail'
+            df_results_filter = df_results[df_results['DATA_TYPE_MATCH']=='Fail']
+            df_results_col  = df_results_filter[['COLUMN_NAME', 'DATA_TYPE_MATCH']]
+        else:
+            status = 'Pass'
+            df_results_col  = df_results[['COLUMN_NAME', 'DATA_TYPE_MATCH']]
+        ctx.log('data_type_validation_process',f"""Data type check for model : {model} is : {status}""")
+
+    except:
+        ctx.log('data_type_validation_process',f""" Error processing data type validation """)
+        return 'Fail', pandas.DataFrame(columns=['COLUMN_NAME', 'DATA_TYPE_MATCH'])
+
+    return status,df_results_col
+
+
+
+def data_type_validation_batch(ctx, config_list:list) -> dict:
+    """
+    Data type validation of all models in a single set based query per database.
+    Columns added or dropped on either side are reported next to type mismatches.
+    Returns a dictionary of model name to (status, failing columns dataframe)
+    """
+    ctx.log('data_type_validation_batch',f"""Function Initiated""")
+    results = {}
+    models_by_database = {}
+    for config in config_list:
+        models_by_database.setdefault(config['database'].upper(), []).append((config['schema'].upper(), config['name'].upper()))
+    # The queries of all databases run at the same time
+    async_queries = AsyncQueries(ctx.session)
+    for database, model_list in models_by_database.items():
+        ctx.log('data_type_validation_batch',f"""Validating {len(model_list)} models of database {database}""")
+        async_queries.submit(database, type_validation_sql(database, model_list))
+    for database, model_list in models_by_database.items():
+        try:
+            df_results = async_queries.result(database, 'pandas')
+        except:
+            ctx.log('data_type_validation_batch',f""" Error processing data type validation for database {database}""")
+            continue
+        for schema, model in model_list:
+            df_model = df_results[(df_results['TABLE_SCHEMA'] == schema) & (df_results['TABLE_NAME'] == model)]
+            df_failed = df_model[df_model['DATA_TYPE_MATCH'] == 'Fail']
+            if df_model.empty:
+                status, df_results_col = 'Fail', pandas.DataFrame([{'COLUMN_NAME': None, 'COLUMN_STATUS': 'Model not found', 'DATA_TYPE_MATCH': 'Fail'}])
+            elif not df_failed.empty:
+                status, df_results_col = 'Fail', df_failed[['COLUMN_NAME', 'COLUMN_STATUS', 'DATA_TYPE_MATCH']]
+            else:
+                status, df_results_col = 'Pass', df_model[['COLUMN_NAME', 'COLUMN_STATUS', 'DATA_TYPE_MATCH']]
+            ctx.log('data_type_validation_batch',f"""Data type check for model : {model} is : {status}""")
+            results[model] = (status, df_results_col.reset_index(drop=True))
+    return results
+
+
+
+def type_validation_stage(ctx, skip_failed:bool = False):
+    """
+    Data type validation of every active model of the run context.
+    In batch mode (type_validation_batch, on by default, Snowpark backend only) all models are validated with one set based query, else model by model.
+    With skip_failed a model that fails the validation is skipped by the later stages
+    """
+    ctx.log('type_validation_stage',f"""Function Initiated""")
+    config_list = ctx.active_configs()
+    # The set based query reads INFORMATION_SCHEMA, other backends validate model by model from their catalog
+    batch_mode = ctx.options.get('type_validation_batch') is not False and ctx.backend.name == 'snowpark'
+    if batch_mode:
+        # Validate every release model with one set based query
+        batch_results = data_type_validation_batch(ctx, config_list)
+
+    for config_block in config_list:
+        model = config_block['name'].upper()
+        ctx.log('type_validation_stage', f""" Model name under process: {model}""" )
+        if batch_mode:
+            status, result_df = batch_results.get(model, ('Fail', pandas.DataFrame(columns=['COLUMN_NAME', 'COLUMN_STATUS', 'DATA_TYPE_MATCH'])))
+        else:
+            with ctx.perf.span('type_validation', model):
+                status, result_df = data_type_validation_process(ctx, config_block)
+        ctx.record(TYPE_VALIDATION_STAGE, model, status, result_df.to_string())
+        if skip_failed and status == 'Fail':
+            ctx.skip(model, 'data type validation failed')